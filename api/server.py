@@ -1,151 +1,381 @@
 import asyncio
-import json
+import collections
+import logging
+import math
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+import numpy as np
+import orjson
 import socketio
-from typing import Dict, Any, Optional
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
 from core.servos import Servos
 import uvicorn
 
+# Set up logging. Records are handed to a queue and written to stderr by a
+# listener thread, so the event loop never blocks on terminal output.
+# Guarded because uvicorn imports this file again as "server" from main().
+logger = logging.getLogger('servo-api')
+if not logger.handlers:
+    log_queue = queue.Queue(-1)
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    QueueListener(log_queue, log_handler).start()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Servo ids are int dict keys and angles may be numpy scalars, so every
+# payload is encoded with both options enabled
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# orjson-backed codec for python-socketio packets
+class _OrjsonShim:
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+# REST responses use the same encoder as Socket.IO packets
+class OrjsonResponse(JSONResponse):
+    def render(self, content):
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
 # Create Socket.IO server with ASGI support
 socket = socketio.AsyncServer(
+    json=_OrjsonShim,
     cors_allowed_origins=["http://localhost:5173", "http://pi.local:5173"],
     async_mode="asgi",  
-    ping_interval=1,
-    ping_timeout=5
+    # Engine.IO defaults; a 1s ping added a round trip per client per second
+    ping_interval=25,
+    ping_timeout=20
 )
 
-# Create ASGI application
-app = socketio.ASGIApp(
-    socketio_server=socket,
-    socketio_path="socket.io"
-)
+# Plain HTTP routes for clients that poll instead of holding a socket open.
+# Serial I/O runs in a worker thread so it never blocks the event loop.
+async def http_get_positions(request):
+    if not servo_controller or not servo_controller.connected:
+        return OrjsonResponse(NOT_CONNECTED, status_code=503)
+    positions = await run_on_bus(servo_controller.get_angles)
+    return OrjsonResponse({"status": "success", "positions": positions})
+
+async def http_update_servo(request):
+    if not servo_controller or not servo_controller.connected:
+        return OrjsonResponse(NOT_CONNECTED, status_code=503)
+    try:
+        data = orjson.loads(await request.body())
+        servo_id = int(data["servo_id"])
+        position = float(data["position"])
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        return OrjsonResponse({"status": "error", "message": str(e)}, status_code=400)
+    await run_on_bus(servo_controller.set_angle, {servo_id: position})
+    positions_changed.set()
+    return OrjsonResponse({"status": "success", "servo_id": servo_id, "position": position})
+
+async def http_center_all(request):
+    if not servo_controller or not servo_controller.connected:
+        return OrjsonResponse(NOT_CONNECTED, status_code=503)
+    await run_on_bus(servo_controller.set_angles_array, *_center_targets)
+    positions_changed.set()
+    return OrjsonResponse({"status": "success"})
+
+rest_app = Starlette(routes=[
+    Route("/api/servo/positions", http_get_positions, methods=["GET"]),
+    Route("/api/servo/update", http_update_servo, methods=["POST"]),
+    Route("/api/servo/center", http_center_all, methods=["POST"]),
+])
+
 
 # Global variables
 servo_controller = None
 is_calibrating = False
+connected_clients = set()
 
-# Middleware functions
-def require_servo_connection(handler):
-    async def wrapper(sid, data=None):
-        if not servo_controller or not servo_controller.connected:
-            return {"status": "error", "message": "Servo controller not connected"}
-        return await handler(sid, data)
-    return wrapper
-
-def require_calibration_mode(handler):
-    async def wrapper(sid, data=None):
-        if not servo_controller or not servo_controller.connected or not is_calibrating:
-            return {"status": "error", "message": "Not in calibration mode or servo controller not connected"}
-        return await handler(sid, data)
-    return wrapper
-
-def with_error_handling(handler):
-    async def wrapper(sid, data=None):
-        try:
-            return await handler(sid, data)
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-    return wrapper
+# Servo ids in the order used by binary position frames; sent to each client
+# in a 'meta' event on connect. Set once the controller is connected.
+servo_order = ()
+POSITION_SCALE = 100  # int16 hundredths of a degree
+
+# Latest angles read by the broadcaster and when they were read, so new
+# clients can get a snapshot without another bus transaction
+_last_angles = None
+_last_angles_time = 0.0
+SNAPSHOT_MAX_AGE = 0.25
+
+# Set by handlers that command motion so the broadcaster wakes immediately
+positions_changed = asyncio.Event()
+
+# Cleared while calibrating so the broadcaster parks instead of polling
+broadcast_enabled = asyncio.Event()
+broadcast_enabled.set()
+
+# Serializes bus transactions. The serial I/O itself runs in a worker thread
+# so the event loop keeps serving other clients while the bus is busy.
+bus_lock = asyncio.Lock()
+
+async def run_on_bus(fn, *args):
+    async with bus_lock:
+        return await asyncio.to_thread(fn, *args)
+
+# Position samples waiting for the next flush. The broadcaster samples the bus
+# at 100Hz; flush_loop sends whatever has accumulated as one batch event, so
+# each client gets one frame per flush instead of one per sample.
+pending_samples = collections.deque(maxlen=64)
+FLUSH_INTERVAL = 0.02
+
+# Room that receives position batches. Clients join after their meta event
+# and initial snapshot have been sent, so no frame can arrive ahead of them.
+POSITIONS_ROOM = "positions"
+
+# Constant replies for rejected requests, built once instead of per event
+NOT_CONNECTED = {"status": "error", "message": "Servo controller not connected"}
+NOT_CALIBRATING = {"status": "error", "message": "Not in calibration mode or servo controller not connected"}
+NOT_CALIBRATED = {"status": "error", "message": "Servos not calibrated"}
+TORQUE_DISABLED = {"status": "error", "message": "Torque not enabled"}
+
+# Middleware: one wrapper per handler checks the connection and calibration
+# preconditions and turns exceptions into error replies. needs_calib requires
+# calibration mode; needs_motion requires calibrated servos with torque on.
+def guard(needs_conn=False, needs_calib=False, needs_motion=False):
+    def decorator(handler):
+        async def wrapper(sid, data=None):
+            if needs_conn and (not servo_controller or not servo_controller.connected):
+                return NOT_CALIBRATING if needs_calib else NOT_CONNECTED
+            if needs_calib and not is_calibrating:
+                return NOT_CALIBRATING
+            if needs_motion:
+                if not servo_controller.is_calibrated:
+                    return NOT_CALIBRATED
+                if is_calibrating or not servo_controller.torque_enabled:
+                    return TORQUE_DISABLED
+            try:
+                return await handler(sid, data)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+        return wrapper
+    return decorator
+
+# Servo ids and zero angles for center_all. The servo set is fixed for the
+# life of the controller, so these are built once at startup.
+_center_targets = ((), np.zeros(0))
+
+# Initialize servo controller. Runs at startup and again on client connect
+# while the controller is missing (e.g. the arm was unplugged at boot). The
+# lock and the None check keep concurrent calls from opening the port twice
+# or starting duplicate broadcast tasks.
+_init_lock = asyncio.Lock()
 
-# Initialize servo controller
 async def init_servo_controller():
-    global servo_controller
+    async with _init_lock:
+        if servo_controller is None:
+            await _init_servo_controller()
+
+async def _init_servo_controller():
+    global servo_controller, servo_order, _center_targets
     try:
-        print("Initializing servo controller...")
+        logger.info("Initializing servo controller...")
         servo_controller = Servos()
-        servo_controller.connect()
+        await run_on_bus(servo_controller.connect)
+        servo_order = tuple(servo_controller.get_servos())
+        _center_targets = (servo_order, np.zeros(len(servo_order)))
         asyncio.create_task(broadcast_positions())
-        print("Servo controller initialized successfully")
+        asyncio.create_task(flush_loop())
+        logger.info("Servo controller initialized successfully")
     except Exception as e:
-        print(f"Error initializing servo controller: {e}")
+        logger.exception("Error initializing servo controller: %s", e)
         servo_controller = None
 
-# Continuously broadcast servo positions
+# Wait until a handler reports commanded motion, or until the timeout passes.
+# Returns True if motion was commanded.
+async def wait_for_change(timeout):
+    try:
+        await asyncio.wait_for(positions_changed.wait(), timeout)
+        woken = True
+    except asyncio.TimeoutError:
+        woken = False
+    positions_changed.clear()
+    return woken
+
+# Broadcast servo positions. While the arm is moving the bus is polled at
+# 100Hz; once it settles the poll interval doubles each quiet tick up to
+# 200ms, and commanded motion wakes the loop immediately. The idle poll still
+# catches servos moved by hand with torque off.
+#
+# A sample is queued for flush_loop whenever any servo moves, plus once a
+# second as a heartbeat. Each sample is every angle in servo_order as a
+# little-endian int16 in hundredths of a degree.
 async def broadcast_positions():
-    last_broadcast = {}
-    broadcast_interval = 0.01  # 100Hz updates
+    global _last_angles, _last_angles_time
+    # The baseline buffer is allocated once and updated in place every tick
+    last_angles = np.zeros(len(servo_order))
+    has_baseline = False
+    last_keyframe = 0.0
+    broadcast_interval = 0.01  # 100Hz updates while moving
+    max_idle_interval = 0.2
+    keyframe_interval = 1.0
+    moving = False
+    idle_ticks = 0
     
     while True:
         try:
-            if servo_controller and servo_controller.connected and not is_calibrating:
+            if not broadcast_enabled.is_set():
+                moving = False
+                await broadcast_enabled.wait()
+            
+            if moving:
+                idle_ticks = 0
+                await asyncio.sleep(broadcast_interval)
+            else:
+                # Back off exponentially while idle; jitter keeps the poll from
+                # locking into step with client render loops
+                interval = min(max_idle_interval, broadcast_interval * 2 ** min(idle_ticks, 5))
+                idle_ticks += 1
+                if await wait_for_change(interval * random.uniform(0.9, 1.1)):
+                    # Servos may take a tick to start moving; poll quickly
+                    idle_ticks = 0
+            
+            # No listeners means no reason to touch the bus
+            if not connected_clients:
+                moving = False
+                continue
+            
+            if servo_controller and servo_controller.connected:
                 try:
-                    positions = servo_controller.get_angles()
-                    has_changes = False
+                    angles = await run_on_bus(servo_controller.get_angles_array)
+                    now = time.monotonic()
+                    moving = has_baseline and bool((np.abs(angles - last_angles) > 0.05).any())
+                    _last_angles_time = now
                     
-                    for key, value in positions.items():
-                        last_value = last_broadcast.get(key, 0)
-                        if abs(value - last_value) > 0.05:
-                            has_changes = True
-                            break
-                    
-                    # Always broadcast for consistent timing
-                    await socket.emit('servo_positions', {
-                        'positions': positions
-                    })
-                    last_broadcast = positions.copy()
+                    if moving or not has_baseline or now - last_keyframe >= keyframe_interval:
+                        pending_samples.append(encode_angles(angles))
+                        last_angles[:] = angles
+                        # Rebound, not mutated, so readers never see a partial update
+                        _last_angles = angles
+                        has_baseline = True
+                        last_keyframe = now
                 except Exception as e:
-                    print(f"Error in broadcast_positions: {e}")
-            
-            await asyncio.sleep(broadcast_interval)
+                    moving = False
+                    logger.exception("Error in broadcast_positions: %s", e)
                 
         except Exception as e:
-            print(f"Outer error in broadcast_positions: {e}")
+            logger.exception("Outer error in broadcast_positions: %s", e)
             await asyncio.sleep(1)
 
+# Quantize angles to int16 hundredths of a degree for the wire
+def encode_angles(angles):
+    scaled = np.rint(angles * POSITION_SCALE)
+    return np.clip(scaled, -32768, 32767).astype('<i2').tobytes()
+
+# Send queued samples as one binary 'sp_bin' event per flush interval; the
+# payload is the samples' int16 frames back to back, oldest first.
+# python-socketio encodes a room broadcast once and writes the same packet to
+# every member.
+async def flush_loop():
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        if not pending_samples:
+            continue
+        samples = b''.join(pending_samples)
+        pending_samples.clear()
+        try:
+            await socket.emit('sp_bin', samples, to=POSITIONS_ROOM)
+        except Exception as e:
+            logger.exception("Error in flush_loop: %s", e)
+
 # Socket.IO event handlers
 async def on_connect(sid, environ):
-    print(f"Client connected: {sid}")
-    # Send initial positions if available
+    logger.info("Client connected: %s", sid)
+    connected_clients.add(sid)
+    if servo_controller is None:
+        await init_servo_controller()
+    # Send initial positions if available, from the broadcaster's snapshot
+    # when it is fresh enough
     if servo_controller and servo_controller.connected:
         try:
-            positions = servo_controller.get_angles()
-            await socket.emit('servo_positions', {'positions': positions}, room=sid)
+            await socket.emit('meta', {'servo_ids': servo_order, 'scale': POSITION_SCALE}, to=sid)
+            if _last_angles is not None and time.monotonic() - _last_angles_time < SNAPSHOT_MAX_AGE:
+                positions = dict(zip(servo_order, _last_angles.tolist()))
+            else:
+                positions = await run_on_bus(servo_controller.get_angles)
+            await socket.emit('servo_positions', {'positions': positions}, to=sid)
         except Exception as e:
-            print(f"Error sending initial positions: {e}")
+            logger.exception("Error sending initial positions: %s", e)
+    await socket.enter_room(sid, POSITIONS_ROOM)
 
 async def on_disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    logger.info("Client disconnected: %s", sid)
+    connected_clients.discard(sid)
+
+# Slider drags send one update_servo per servo per frame. Updates are
+# collected here and written with a single sync write after a short delay;
+# a newer target for the same servo replaces the older one.
+_pending_updates = {}
+_update_flush_task = None
+UPDATE_FLUSH_DELAY = 0.01
 
-@require_servo_connection
-@with_error_handling
+async def _flush_updates():
+    global _pending_updates, _update_flush_task
+    await asyncio.sleep(UPDATE_FLUSH_DELAY)
+    updates, _pending_updates = _pending_updates, {}
+    _update_flush_task = None
+    try:
+        await run_on_bus(servo_controller.set_angle, updates)
+        positions_changed.set()
+    except Exception as e:
+        logger.exception("Error writing servo updates: %s", e)
+
+@guard(needs_conn=True, needs_motion=True)
 async def on_update_servo(sid, data):
+    global _update_flush_task
     servo_id = data["servo_id"]
-    position = data["position"]
-    servo_controller.set_angle({servo_id: position})
+    position = float(data["position"])
+    # Everything that could make the batched write fail is checked here, so
+    # the success reply holds and one bad update can't sink the others
+    if not math.isfinite(position):
+        raise ValueError(f"Invalid position: {data['position']}")
+    if servo_id not in servo_controller.get_servos():
+        raise ValueError(f"Unknown servo ID: {servo_id}")
+    _pending_updates[servo_id] = position
+    if _update_flush_task is None:
+        _update_flush_task = asyncio.create_task(_flush_updates())
     return {"status": "success", "servo_id": servo_id, "position": position}
 
-@require_servo_connection
-@with_error_handling
+@guard(needs_conn=True)
 async def on_get_positions(sid, data=None):
-    positions = servo_controller.get_angles()
+    positions = await run_on_bus(servo_controller.get_angles)
     return {"status": "success", "positions": positions}
 
-@require_servo_connection
-@with_error_handling
+@guard(needs_conn=True)
 async def on_get_torque(sid, data=None):
-    enabled = servo_controller.get_torque_enabled()
+    enabled = await run_on_bus(servo_controller.get_torque_enabled)
     return {"status": "success", "enabled": enabled}
 
-@require_servo_connection
-@with_error_handling
+@guard(needs_conn=True)
 async def on_set_torque(sid, data):
     enabled = data["enabled"]
-    servo_controller.set_torque_enabled(enabled)
+    await run_on_bus(servo_controller.set_torque_enabled, enabled)
+    positions_changed.set()
     return {"status": "success", "enabled": enabled}
 
-@require_servo_connection
-@with_error_handling
+@guard(needs_conn=True)
 async def on_calibration_start(sid, data=None):
     global is_calibrating
     is_calibrating = True
-    servo_controller.start_calibration()
+    broadcast_enabled.clear()
+    await run_on_bus(servo_controller.start_calibration)
     return {"status": "success", "message": "Calibration mode started"}
 
-@require_calibration_mode
-@with_error_handling
+@guard(needs_conn=True, needs_calib=True)
 async def on_calibration_capture(sid, data):
     servo_id = int(data["joint"])
     angle = data["angle"]
-    current_pos = servo_controller.get_positions()[servo_id]
+    current_pos = (await run_on_bus(servo_controller.get_positions))[servo_id]
     
     # Map angle to calibration point
     calibration_point = "zero"
@@ -167,30 +397,31 @@ async def on_calibration_capture(sid, data):
         "position": current_pos
     }
 
-@require_calibration_mode
-@with_error_handling
+@guard(needs_conn=True, needs_calib=True)
 async def on_calibration_complete(sid, data=None):
     global is_calibrating
     is_calibrating = False
-    servo_controller.end_calibration()
-    servo_controller.set_torque_enabled(True)
+    broadcast_enabled.set()
+    await run_on_bus(servo_controller.end_calibration)
+    await run_on_bus(servo_controller.set_torque_enabled, True)
+    positions_changed.set()
     return {"status": "success", "message": "Calibration completed successfully"}
 
-@require_calibration_mode
-@with_error_handling
+@guard(needs_conn=True, needs_calib=True)
 async def on_calibration_cancel(sid, data=None):
     global is_calibrating
     is_calibrating = False
-    servo_controller.cancel_calibration()
-    servo_controller.set_torque_enabled(True)
-    positions = servo_controller.get_angles()
+    broadcast_enabled.set()
+    await run_on_bus(servo_controller.cancel_calibration)
+    await run_on_bus(servo_controller.set_torque_enabled, True)
+    positions_changed.set()
+    positions = await run_on_bus(servo_controller.get_angles)
     return {"status": "success", "message": "Calibration canceled", "positions": positions}
 
-@require_servo_connection
-@with_error_handling
+@guard(needs_conn=True)
 async def on_center_all(sid, data=None):
-    angles = {servo_id: 0 for servo_id in servo_controller.get_servos()}
-    servo_controller.set_angle(angles)
+    await run_on_bus(servo_controller.set_angles_array, *_center_targets)
+    positions_changed.set()
     return {"status": "success"}
 
 # Register event handlers
@@ -206,19 +437,29 @@ socket.on('calibration_complete', on_calibration_complete)
 socket.on('calibration_cancel', on_calibration_cancel)
 socket.on('center_all', on_center_all)
 
-# Initialize on startup
-@socket.event
-async def connect(sid, environ):
-    await init_servo_controller()
-    await on_connect(sid, environ)
+# Create ASGI application; anything outside socket.io falls through to REST.
+# The servo controller is brought up once from the lifespan startup event.
+app = socketio.ASGIApp(
+    socketio_server=socket,
+    other_asgi_app=rest_app,
+    socketio_path="socket.io",
+    on_startup=init_servo_controller
+)
 
 def main():
-    # Run with Uvicorn and auto-reload
+    # Run with Uvicorn on uvloop/httptools. No auto-reload: the reloader runs
+    # the app in a child process and restarts it, reopening the serial port.
+    # A single worker: the serial port can only be owned by one process, and
+    # Socket.IO sessions would need sticky routing across workers.
     uvicorn.run(
         "server:app", 
         host="0.0.0.0", 
         port=1212, 
-        reload=True
+        reload=False,
+        workers=1,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets"
     )
 
 if __name__ == '__main__':
@@ -1,15 +1,29 @@
 import time
 import numpy as np
 import scservo_sdk as scs
-import json
+import orjson
 import os
+import sys
 import serial
-import traceback
+import logging
+import threading
+import queue
+from concurrent.futures import Future
+
+try:
+    from numba import njit
+except ImportError:
+    # Without numba the scalar conversion cores run as plain Python
+    def njit(*args, **kwargs):
+        return lambda fn: fn
 
 PROTOCOL_VERSION = 0
 BAUDRATE = 1_000_000
 TIMEOUT_MS = 1000
 NUM_RETRY = 10
+# Retry backoff doubles from RETRY_DELAY_MIN up to RETRY_DELAY_MAX seconds
+RETRY_DELAY_MIN = 0.001
+RETRY_DELAY_MAX = 0.01
 
 SCS_CONTROL_TABLE = {
     "Torque_Enable": (40, 1),
@@ -22,8 +36,65 @@ SCS_CONTROL_TABLE = {
     "Lock": (55, 1),
     "Maximum_Acceleration": (85, 2),
     "Acceleration": (41, 1),
+    "Moving": (66, 1),
+    # Contiguous spans written as a single register
+    "PID_Coefficients": (21, 3),  # P (21), D (22), I (23)
+    "Torque_Accel_Goal": (40, 4),  # Torque_Enable (40), Acceleration (41), Goal_Position (42)
 }
 
+# Little-endian register encodings by size in bytes
+BYTE_DTYPES = {1: '<u1', 2: '<u2', 4: '<u4'}
+
+# Scalar conversion cores for per-servo callers, on the per-servo constants
+# precomputed by Servos._rebuild_cal_arrays. The batch methods on Servos
+# implement the same mapping over arrays.
+@njit(cache=True)
+def _pos2ang_core(position, zero, sign, pos_scale, neg_scale):
+    delta = position - zero
+    return sign * delta * (pos_scale if delta > 0 else neg_scale)
+
+@njit(cache=True)
+def _ang2pos_core(angle, zero, sign, pos_range, neg_range):
+    working = sign * angle
+    rng = pos_range if working > 0 else neg_range
+    return int(zero + working / 90.0 * rng)
+
+logger = logging.getLogger(__name__)
+
+# USB-serial adapters buffer replies for up to 16 ms by default, which is
+# added to every bus transaction. Ask the driver for low latency mode and,
+# failing that, lower the FTDI latency timer. Ports that support neither
+# (e.g. CDC-ACM or virtual ports) are left as they are.
+def set_low_latency(ser):
+    if not sys.platform.startswith('linux'):
+        return
+    try:
+        ser.set_low_latency_mode(True)
+        return
+    except (AttributeError, OSError, ValueError):
+        pass
+    tty = os.path.basename(os.path.realpath(ser.port))
+    try:
+        with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", 'w') as f:
+            f.write("1")
+    except OSError:
+        pass
+
+# Raw JSON file contents by path, reused while (mtime, size) is unchanged.
+# Bytes are cached rather than the parsed object so every caller gets its
+# own dict and edits never leak back into the cache.
+_FILE_CACHE = {}
+
+def _cached_json(path):
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _FILE_CACHE.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, 'rb') as f:
+            cached = (key, f.read())
+        _FILE_CACHE[path] = cached
+    return orjson.loads(cached[1])
+
 CONFIG_FILENAME = "data/config.json"
 CALIBRATION_FILENAME = "data/calibration.json"
 
@@ -53,7 +124,9 @@ class Servos:
         # Use provided parameters or config values
         self.port = port or self.config.get('port')
         self.virtual_port = virtual_port or self.config.get('virtual_port')
-        self.servo_ids = servo_ids or self.config.get('servo_ids', [])
+        # Ordered ids for iteration and packet layout, plus a set for lookups
+        self.servo_ids = tuple(servo_ids or self.config.get('servo_ids', []))
+        self._servo_id_set = frozenset(self.servo_ids)
         
         # Configuration parameters
         self.p_coef = p_coef
@@ -65,6 +138,14 @@ class Servos:
         # Internal tracking
         self._readers = {}
         self._writers = {}
+        self._io_thread = None
+        self._io_queue = None
+        self._pending_read = None
+        self._rebuild_cal_arrays()
+        
+        # Compile the scalar cores up front rather than on the first call
+        _pos2ang_core(0, 0, 1.0, 0.0, 0.0)
+        _ang2pos_core(0.0, 0, 1.0, 0.0, 0.0)
         
         # Validate essential configuration
         if not self.port:
@@ -105,24 +186,88 @@ class Servos:
             # Replace the setupPort method based on virtual_port setting
             if self.virtual_port:
                 self.port_handler.setupPort = virtual_port_setup
-                print(f"[Servos] Using virtual port setup for {self.port}")
+                logger.info("Using virtual port setup for %s", self.port)
             
             if not self.port_handler.openPort():
                 raise OSError(f"Failed to open port '{self.port}'")
             
             self.port_handler.setBaudRate(BAUDRATE)
             self.port_handler.setPacketTimeoutMillis(TIMEOUT_MS)
+            set_low_latency(self.port_handler.ser)
+            self._install_fast_read()
+            self._start_io()
             self.connected = True
-            print(f"Connected on {self.port}")
+            logger.info("Connected on %s", self.port)
             self._configure_servos()
+            self._prepare_writer("Goal_Position")
             self.set_torque_enabled(True)
         
         except Exception as e:
-            traceback.print_exc()
+            logger.exception("Failed to connect on %s", self.port)
+            self._stop_io()
             if hasattr(self, 'port_handler') and self.port_handler:
                 self.port_handler.closePort()
             raise e
 
+    # The SDK polls readPort while waiting for a reply, and pyserial wraps
+    # every poll in a select() plus timeout bookkeeping. The port is opened
+    # non-blocking, so read whatever the driver has straight from the file
+    # descriptor; the SDK's own packet timeout still bounds the wait.
+    def _install_fast_read(self):
+        if os.name != 'posix':
+            return
+        try:
+            fd = self.port_handler.ser.fileno()
+        except (AttributeError, serial.SerialException):
+            return
+
+        def fast_read_port(length):
+            try:
+                return os.read(fd, length)
+            except BlockingIOError:
+                return b''
+
+        self.port_handler.readPort = fast_read_port
+
+    # All bus transactions run on one IO thread fed by a queue. Synchronous
+    # calls from other threads are forwarded and wait on the result; the
+    # *_async methods return the Future so callers can overlap their own
+    # work with the serial round trip.
+    def _start_io(self):
+        self._io_queue = queue.Queue()
+        self._io_thread = threading.Thread(target=self._io_loop, name="servo-io", daemon=True)
+        self._io_thread.start()
+
+    def _stop_io(self):
+        if self._io_thread is None:
+            return
+        self._io_queue.put(None)
+        self._io_thread.join()
+        self._io_thread = None
+        self._io_queue = None
+
+    def _io_loop(self):
+        while True:
+            item = self._io_queue.get()
+            if item is None:
+                return
+            fn, args, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _submit(self, fn, *args):
+        assert self.connected, "Not connected to servos. Call connect() first."
+        future = Future()
+        self._io_queue.put((fn, args, future))
+        return future
+
+    def _on_io_thread(self):
+        return threading.current_thread() is self._io_thread
+
     def disconnect(self):
         if not self.connected:
             return
@@ -133,13 +278,15 @@ class Servos:
             
         time.sleep(0.1)
             
+        self._stop_io()
         if hasattr(self, 'port_handler') and self.port_handler:
             self.port_handler.closePort()
             
         self._readers = {}
         self._writers = {}
+        self._pending_read = None
         self.connected = False
-        print("Disconnected")
+        logger.info("Disconnected")
 
     def get_torque_enabled(self):
         assert self.connected, "Not connected to servos. Call connect() first."
@@ -149,23 +296,48 @@ class Servos:
         assert self.connected, "Not connected to servos. Call connect() first."
         self._write("Torque_Enable", 1 if enabled else 0)
         self.torque_enabled = enabled
-        print(f"Torque {'enabled' if enabled else 'disabled'}")
+        logger.info("Torque %s", "enabled" if enabled else "disabled")
         
-    def get_positions(self):
+    def enable_torque_and_hold(self):
+        """Enable torque with every servo holding its present position."""
         assert self.connected, "Not connected to servos. Call connect() first."
         
-        positions = self._read("Present_Position", self.servo_ids)
-        return {servo_id: int(pos) for servo_id, pos in zip(self.servo_ids, positions)}
+        # One 4-byte write per servo sets torque, acceleration and goal
+        # together instead of a torque packet followed by a goal packet
+        positions = self._read("Present_Position", self.servo_ids).astype(np.int64)
+        self._write("Torque_Accel_Goal", 1 | (self.accel << 8) | (positions << 16))
+        self.torque_enabled = True
+        logger.info("Torque enabled, holding position")
+        
+    def get_positions(self):
+        assert self.connected, "Not connected to servos. Call connect() first."
+        return dict(zip(self.servo_ids, self._read("Present_Position", self.servo_ids).tolist()))
+    
+    def get_positions_array(self):
+        """Current positions as an int32 ndarray ordered like get_servos()."""
+        assert self.connected, "Not connected to servos. Call connect() first."
+        return self._read("Present_Position", self.servo_ids).copy()
+    
+    def get_positions_async(self):
+        """Start a position read on the IO thread and return its Future."""
+        return self._submit(self.get_positions)
     
     def set_position(self, positions):
         assert self.connected, "Not connected to servos. Call connect() first."
         assert self.torque_enabled, "Torque not enabled. Call enable_torque() first."
+        
+        # Commands for every servo go out in servo_ids order through the
+        # Goal_Position writer prepared at connect
+        if len(positions) == len(self.servo_ids) and positions.keys() == self._servo_id_set:
+            self.set_positions_array(np.fromiter((positions[servo_id] for servo_id in self.servo_ids),
+                                                 dtype=np.float64, count=len(self.servo_ids)))
+            return
             
         pos_values = []
         servo_ids = []
         
         for servo_id, position in positions.items():
-            if servo_id not in self.servo_ids:
+            if servo_id not in self._servo_id_set:
                 raise ValueError(f"Unknown servo ID: {servo_id}")
                 
             pos_values.append(int(position))
@@ -174,6 +346,51 @@ class Servos:
         if pos_values:
             self._write("Goal_Position", pos_values, servo_ids)
             
+    def set_positions_array(self, positions):
+        """Move every servo to positions ordered like get_servos()."""
+        assert self.connected, "Not connected to servos. Call connect() first."
+        assert self.torque_enabled, "Torque not enabled. Call enable_torque() first."
+        
+        if len(positions) != len(self.servo_ids):
+            raise ValueError(f"Expected {len(self.servo_ids)} positions, got {len(positions)}")
+        self._write("Goal_Position", positions, self.servo_ids)
+            
+    def get_moving_flags(self):
+        """Moving register of every servo as a bool ndarray ordered like get_servos()."""
+        assert self.connected, "Not connected to servos. Call connect() first."
+        return self._read("Moving", self.servo_ids).astype(bool)
+    
+    def wait_for_position(self, positions, tolerance=20, timeout=3.0,
+                          check_interval=0.005, max_interval=0.05):
+        """
+        Wait until the servos in positions ({servo_id: raw position}) have
+        stopped within tolerance of those targets. Returns False if that
+        doesn't happen before the timeout.
+        """
+        assert self.connected, "Not connected to servos. Call connect() first."
+        
+        servo_ids = tuple(positions)
+        for servo_id in servo_ids:
+            if servo_id not in self._servo_id_set:
+                raise ValueError(f"Unknown servo ID: {servo_id}")
+        
+        # Poll the 1-byte Moving flags, and read positions only once they are
+        # all clear. Clear flags away from the targets usually mean the move
+        # was just commanded and hasn't started, so keep polling until the
+        # deadline. The interval backs off from check_interval to max_interval.
+        targets = np.fromiter(positions.values(), dtype=np.float64, count=len(servo_ids))
+        deadline = time.monotonic() + timeout
+        interval = check_interval
+        while True:
+            if not self._read("Moving", servo_ids).any():
+                present = self._read("Present_Position", servo_ids)
+                if np.all(np.abs(present - targets) <= tolerance):
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+            
     def get_servos(self):
         return self.servo_ids
     
@@ -182,30 +399,48 @@ class Servos:
         assert self.connected, "Not connected to servos. Call connect() first."
         assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
         
-        positions = self.get_positions()
-        return {servo_id: self._position_to_angle(servo_id, pos) 
-                for servo_id, pos in positions.items()}
+        return dict(zip(self.servo_ids, self.get_angles_array().tolist()))
+    
+    def get_angles_array(self):
+        """Current angles as an ndarray ordered like get_servos()."""
+        assert self.connected, "Not connected to servos. Call connect() first."
+        assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
+        
+        return self.positions_to_angles(self._read("Present_Position", self.servo_ids))
     
     def set_angle(self, angles):
         assert self.connected, "Not connected to servos. Call connect() first."
         assert self.torque_enabled, "Torque not enabled. Call enable_torque() first."
         assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
         
-        positions = {}
-        for servo_id, angle in angles.items():
-            if servo_id not in self.servo_ids:
+        self.set_angles_array(list(angles.keys()), list(angles.values()))
+    
+    def set_angles_array(self, servo_ids, angles):
+        """Move servos to angles (parallel sequences) with a single sync write."""
+        assert self.connected, "Not connected to servos. Call connect() first."
+        assert self.torque_enabled, "Torque not enabled. Call enable_torque() first."
+        assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
+        
+        servo_ids = [int(servo_id) for servo_id in servo_ids]
+        for servo_id in servo_ids:
+            if servo_id not in self._servo_id_set:
                 raise ValueError(f"Unknown servo ID: {servo_id}")
-            positions[servo_id] = self._angle_to_position(servo_id, angle)
-            
-        if positions:
-            self.set_position(positions)
+        
+        if len(servo_ids) == len(self.servo_ids) and self._servo_id_set == set(servo_ids):
+            by_id = dict(zip(servo_ids, angles))
+            servo_ids = self.servo_ids
+            angles = [by_id[servo_id] for servo_id in servo_ids]
+        
+        if servo_ids:
+            positions = self.angles_to_positions(angles, servo_ids)
+            self._write("Goal_Position", positions, servo_ids)
 
     # Calibration functions
     def start_calibration(self):
         assert self.connected, "Not connected to servos. Call connect() first."
         
         if self.calibration_mode:
-            print("Calibration already in progress")
+            logger.info("Calibration already in progress")
             return
             
         # Initialize temporary calibration data
@@ -216,13 +451,13 @@ class Servos:
         if self.torque_enabled:
             self.set_torque_enabled(False)
             
-        print("Calibration started. Torque disabled.")
+        logger.info("Calibration started. Torque disabled.")
         
     def end_calibration(self):
         assert self.calibration_mode, "No calibration in progress. Call start_calibration() first."
             
         if not self.temp_calibration_data:
-            print("No calibration points set, nothing to save")
+            logger.info("No calibration points set, nothing to save")
             self.calibration_mode = False
             return
             
@@ -245,9 +480,9 @@ class Servos:
                 missing_points[servo_id_str] = servo_missing
         
         if missing_points:
-            print("Incomplete calibration, cannot save:")
+            logger.warning("Incomplete calibration, cannot save:")
             for servo_id, points in missing_points.items():
-                print(f"  Servo {servo_id} missing: {', '.join(points)}")
+                logger.warning("  Servo %s missing: %s", servo_id, ", ".join(points))
             self.calibration_mode = False
             return
             
@@ -258,30 +493,34 @@ class Servos:
         # Create directory if needed
         os.makedirs(os.path.dirname(self.calibration_file), exist_ok=True)
         
-        # Save to file
-        with open(self.calibration_file, 'w') as f:
-            json.dump(self.calibration, f, indent=2)
+        # Save to a temporary file and swap it in, so a crash mid-write
+        # never leaves a truncated calibration behind
+        data = orjson.dumps(self.calibration, option=orjson.OPT_INDENT_2)
+        tmp_file = self.calibration_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.calibration_file)
+        _FILE_CACHE.pop(self.calibration_file, None)
             
-        print(f"Calibration saved")
+        logger.info("Calibration saved")
         self.calibration_mode = False
         self.temp_calibration_data = {}
-
-        # Reload calibration
-        self.calibration = self._load_calibration()
-        self.is_calibrated = bool(self.calibration)
+        self._rebuild_cal_arrays()
 
         self.set_torque_enabled(True)
 
         
     def cancel_calibration(self):
         if not self.calibration_mode:
-            print("No calibration in progress")
+            logger.info("No calibration in progress")
             return
             
         # Restore previous calibration state
         self.temp_calibration_data = {}
         self.calibration_mode = False
-        print("Calibration cancelled")
+        logger.info("Calibration cancelled")
 
         self.set_torque_enabled(True)
         
@@ -289,7 +528,7 @@ class Servos:
         assert self.connected, "Not connected to servos. Call connect() first."
         assert self.calibration_mode, "Calibration not in progress. Call start_calibration() first."
             
-        if servo_id not in self.servo_ids:
+        if servo_id not in self._servo_id_set:
             raise ValueError(f"Unknown servo ID: {servo_id}")
             
         if point_name not in ['zero', 'min', 'max']:
@@ -302,7 +541,7 @@ class Servos:
         # Update temp calibration
         servo_cal = self.temp_calibration_data.setdefault(str(servo_id), {})
         servo_cal[point_name] = position
-        print(f"Set {point_name} for servo {servo_id}: {position}")
+        logger.info("Set %s for servo %s: %s", point_name, servo_id, position)
         
     def iterative_calibration(self):
         assert self.connected, "Not connected to servos. Call connect() first."
@@ -340,200 +579,322 @@ class Servos:
         
         except Exception as e:
             self.cancel_calibration()
-            print(f"Calibration failed: {e}")
+            logger.error("Calibration failed: %s", e)
         
     # Config and file operations
     def _load_config(self):
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                print(f"Config loaded")
-                return config
-            else:
-                print(f"Config file not found")
-                return {}
+            config = _cached_json(self.config_file)
+            logger.info("Config loaded")
+            return config
+        except FileNotFoundError:
+            logger.info("Config file not found")
+            return {}
         except Exception as e:
-            print(f"Error loading config: {e}")
+            logger.error("Error loading config: %s", e)
             return {}
         
     def _load_calibration(self):
         try:
-            if os.path.exists(self.calibration_file):
-                with open(self.calibration_file, 'r') as f:
-                    calibration = json.load(f)
-                print(f"Calibration loaded")
-                return calibration
-            else:
-                print(f"Calibration file not found")
-                return {}
+            calibration = _cached_json(self.calibration_file)
+            logger.info("Calibration loaded")
+            return calibration
+        except FileNotFoundError:
+            logger.info("Calibration file not found")
+            return {}
         except Exception as e:
-            print(f"Error loading calibration: {e}")
+            logger.error("Error loading calibration: %s", e)
             return {}
 
     # Low-level communication
     def _read(self, data_name, servo_ids=None):
         assert self.connected, "Not connected to servos. Call connect() first."
+        if not self._on_io_thread():
+            # Copy on the IO thread: the reader's buffer may be refilled by
+            # the next queued read before this thread gets to look at it
+            return self._submit(lambda: self._read(data_name, servo_ids).copy()).result()
 
         servo_ids = servo_ids or self.servo_ids
         if isinstance(servo_ids, int):
-            servo_ids = [servo_ids]
-
-        addr, size = SCS_CONTROL_TABLE[data_name]
-        group_key = f"{data_name}_{'_'.join(map(str, servo_ids))}"
-
-        # Always recreate the reader to avoid stale state
-        reader = scs.GroupSyncRead(self.port_handler, self.packet_handler, addr, size)
-        for servo_id in servo_ids:
-            reader.addParam(servo_id)
-
-        # Reset buffers before each read
-        self.port_handler.ser.reset_output_buffer()
-        self.port_handler.ser.reset_input_buffer()
+            servo_ids = (servo_ids,)
 
+        self._drop_pending_read()
+        reader = self._get_reader(data_name, servo_ids)
         for attempt in range(NUM_RETRY):
             if reader.txRxPacket() == scs.COMM_SUCCESS:
                 break
+            self._recover()
             if attempt < NUM_RETRY - 1:
-                time.sleep(0.05)
+                time.sleep(min(RETRY_DELAY_MAX, RETRY_DELAY_MIN * (1 << attempt)))
         else:
             raise RuntimeError(f"Communication error during read after {NUM_RETRY} retries")
 
-        return np.array([reader.getData(id, addr, size) for id in servo_ids], dtype=np.int32)
+        return self._reader_values(reader, servo_ids)
+
+    # Readers are kept per register and id set; each txRxPacket refreshes
+    # the data, so reuse carries no stale state. The register address and
+    # size ride along on the reader to skip the control table lookup.
+    def _get_reader(self, data_name, servo_ids):
+        group_key = (data_name, tuple(servo_ids))
+        reader = self._readers.get(group_key)
+        if reader is None:
+            addr, size = SCS_CONTROL_TABLE[data_name]
+            reader = scs.GroupSyncRead(self.port_handler, self.packet_handler, addr, size)
+            reader._addr_size = (addr, size)
+            reader._buf = np.empty(len(servo_ids), dtype=np.int32)
+            for servo_id in servo_ids:
+                reader.addParam(servo_id)
+            self._readers[group_key] = reader
+        return reader
+
+    # Values are filled into the reader's preallocated buffer, so the array
+    # _read returns is overwritten by the next read of the same register and
+    # ids. Callers on the IO thread consume it right away; reads forwarded
+    # from other threads get a copy taken on the IO thread.
+    def _reader_values(self, reader, servo_ids):
+        addr, size = reader._addr_size
+        buf = reader._buf
+        for i, servo_id in enumerate(servo_ids):
+            buf[i] = reader.getData(servo_id, addr, size)
+        return buf
+
+    # Split-phase reads: begin_read sends the request and returns, and
+    # finish_read collects the reply later, so the caller's own work overlaps
+    # the servos' response time. Any other transaction in between discards the
+    # pending reply first, and finish_read then falls back to a full read.
+    def begin_read(self, data_name="Present_Position"):
+        assert self.connected, "Not connected to servos. Call connect() first."
+        if not self._on_io_thread():
+            return self._submit(self.begin_read, data_name).result()
+
+        self._drop_pending_read()
+        reader = self._get_reader(data_name, self.servo_ids)
+        if reader.txPacket() == scs.COMM_SUCCESS:
+            self._pending_read = (data_name, reader)
+        else:
+            self._recover()
+
+    def finish_read(self, data_name="Present_Position"):
+        assert self.connected, "Not connected to servos. Call connect() first."
+        if not self._on_io_thread():
+            return self._submit(self.finish_read, data_name).result()
+
+        pending, self._pending_read = self._pending_read, None
+        if pending is not None and pending[0] == data_name:
+            reader = pending[1]
+            if reader.rxPacket() == scs.COMM_SUCCESS:
+                return self._reader_values(reader, self.servo_ids).copy()
+            self._recover()
+        return self._read(data_name, self.servo_ids).copy()
+
+    def step(self, goal_positions):
+        """
+        One pipelined control cycle: collect the positions requested by the
+        previous step (or read them now on the first call), send the new
+        goals, and request the next positions without waiting for them.
+        """
+        assert self.connected, "Not connected to servos. Call connect() first."
+        assert self.torque_enabled, "Torque not enabled. Call enable_torque() first."
+        if not self._on_io_thread():
+            return self._submit(self.step, goal_positions).result()
+
+        positions = self.finish_read()
+        self.set_positions_array(goal_positions)
+        self.begin_read()
+        return positions
+
+    def _drop_pending_read(self):
+        if self._pending_read is not None:
+            self._pending_read[1].rxPacket()
+            self._pending_read = None
 
     def _write(self, data_name, values=None, servo_ids=None):
         assert self.connected, "Not connected to servos. Call connect() first."
+        if not self._on_io_thread():
+            return self._submit(self._write, data_name, values, servo_ids).result()
+        self._drop_pending_read()
 
         servo_ids = servo_ids or self.servo_ids
         if isinstance(servo_ids, int):
-            servo_ids = [servo_ids]
+            servo_ids = (servo_ids,)
 
         if values is None:
             values = [1] * len(servo_ids)
         if isinstance(values, (int, float, np.integer)):
             values = [values] * len(servo_ids)
 
+        # Float arrays cast to int32 without complaint, turning NaN, inf and
+        # overflow into INT_MIN; check them like np.array does for lists
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+            if not (np.isfinite(values).all() and np.abs(values).max(initial=0) < 2**31):
+                raise ValueError(f"Invalid {data_name} values: {values}")
         values = np.array(values, dtype=np.int32)
-        addr, size = SCS_CONTROL_TABLE[data_name]
-        group_key = f"{data_name}_{'_'.join(map(str, servo_ids))}"
-
-        # Always recreate the writer to avoid stale state
-        writer = scs.GroupSyncWrite(self.port_handler, self.packet_handler, addr, size)
-        for servo_id, val in zip(servo_ids, values):
-            writer.addParam(servo_id, self._to_bytes(val, size))
+        group_key = (data_name, tuple(servo_ids))
 
-        # Reset buffers before each write
-        self.port_handler.ser.reset_output_buffer()
-        self.port_handler.ser.reset_input_buffer()
+        # Writers are kept per register and id set; new values replace the
+        # previous ones with changeParam, which marks the packet for rebuild
+        # All values are packed little-endian in one call and split into
+        # per-servo byte lists by a single tolist()
+        writer = self._writers.get(group_key)
+        is_new = writer is None
+        if is_new:
+            addr, size = SCS_CONTROL_TABLE[data_name]
+            writer = scs.GroupSyncWrite(self.port_handler, self.packet_handler, addr, size)
+            writer._addr_size = (addr, size)
+        size = writer._addr_size[1]
+        raw = self._to_bytes(values, size)
+        params = np.frombuffer(raw, dtype=np.uint8).reshape(-1, size).tolist()
+        if is_new:
+            for servo_id, param in zip(servo_ids, params):
+                writer.addParam(servo_id, param)
+            self._writers[group_key] = writer
+        else:
+            for servo_id, param in zip(servo_ids, params):
+                writer.changeParam(servo_id, param)
 
         for attempt in range(NUM_RETRY):
             if writer.txPacket() == scs.COMM_SUCCESS:
                 break
+            self._recover()
             if attempt < NUM_RETRY - 1:
-                time.sleep(0.05)
+                time.sleep(min(RETRY_DELAY_MAX, RETRY_DELAY_MIN * (1 << attempt)))
         else:
             raise RuntimeError("Communication error during write")
 
+    # Build and cache the all-servo writer for a register without sending it.
+    # Its placeholder values are replaced by changeParam before the first
+    # transmit, so later writes skip the per-servo addParam setup.
+    def _prepare_writer(self, data_name):
+        group_key = (data_name, self.servo_ids)
+        if group_key in self._writers:
+            return
+        addr, size = SCS_CONTROL_TABLE[data_name]
+        writer = scs.GroupSyncWrite(self.port_handler, self.packet_handler, addr, size)
+        writer._addr_size = (addr, size)
+        for servo_id in self.servo_ids:
+            writer.addParam(servo_id, [0] * size)
+        self._writers[group_key] = writer
+
+    # Drop partial or stale bytes after a failed transaction so the retry
+    # starts from a clean line. Only done on error: flushing before every
+    # transaction costs a kernel round trip and can discard a valid reply.
+    def _recover(self):
+        self.port_handler.ser.reset_output_buffer()
+        self.port_handler.ser.reset_input_buffer()
+
     def _configure_servos(self):
         assert self.connected, "Not connected to servos. Call connect() first."
             
-        # Configure but don't automatically enable torque
-        for servo_id in self.servo_ids:
-            self._write("Mode", 0, servo_id)
-            self._write("P_Coefficient", self.p_coef, servo_id)
-            self._write("I_Coefficient", self.i_coef, servo_id)
-            self._write("D_Coefficient", self.d_coef, servo_id)            
-            self._write("Lock", 0, servo_id)
-            self._write("Maximum_Acceleration", self.max_accel, servo_id)
-            self._write("Acceleration", self.accel, servo_id)
+        # Configure but don't automatically enable torque. Each register is
+        # set on every servo with one sync write packet; the adjacent PID
+        # gains share a single 3-byte packet.
+        self._write("Mode", 0)
+        self._write("PID_Coefficients", self.p_coef | (self.d_coef << 8) | (self.i_coef << 16))
+        self._write("Lock", 0)
+        self._write("Maximum_Acceleration", self.max_accel)
+        self._write("Acceleration", self.accel)
             
-        print("Servos configured")
-
-    def _to_bytes(self, value, size):
-        if size == 1:
-            return [value & 0xFF]
-        elif size == 2:
-            return [value & 0xFF, (value >> 8) & 0xFF]
-        elif size == 4:
-            return [
-                value & 0xFF,
-                (value >> 8) & 0xFF,
-                (value >> 16) & 0xFF,
-                (value >> 24) & 0xFF,
-            ]
-        else:
-            raise ValueError(f"Unsupported byte size: {size}")
-        
+        logger.info("Servos configured")
+
+    def _to_bytes(self, values, size):
+        values = np.asarray(values, dtype=np.int64)
+        # Casting to the unsigned type wraps negatives, like masking each byte
+        if size in BYTE_DTYPES:
+            return values.astype(BYTE_DTYPES[size]).tobytes()
+        # Odd-sized spans keep the low bytes of each 4-byte value
+        if 0 < size < 4:
+            return values.astype('<u4').view(np.uint8).reshape(-1, 4)[:, :size].tobytes()
+        raise ValueError(f"Unsupported byte size: {size}")
+        
+    # Calibration as arrays in servo_ids order, so conversions index arrays
+    # instead of looking up nested dicts by string id. Per servo this keeps
+    # the zero position, the direction (-1 when min > max) and the position
+    # span on each side of zero; the position->angle scales are 0 for flat
+    # spans so those servos read as 0 degrees. Servos missing from the
+    # calibration have no entry in _cal_index, and the whole set then counts
+    # as uncalibrated: the all-servo batch conversions would otherwise read
+    # their zero-filled slots as real calibration.
+    def _rebuild_cal_arrays(self):
+        n = len(self.servo_ids)
+        zero = np.zeros(n, dtype=np.int32)
+        min_pos = np.zeros(n, dtype=np.int32)
+        max_pos = np.zeros(n, dtype=np.int32)
+        self._cal_index = {}
+        for idx, servo_id in enumerate(self.servo_ids):
+            cal = self.calibration.get(str(servo_id))
+            if not cal:
+                continue
+            zero[idx] = cal['zero']
+            min_pos[idx] = cal['min']
+            max_pos[idx] = cal['max']
+            self._cal_index[servo_id] = idx
+
+        missing = [servo_id for servo_id in self.servo_ids if servo_id not in self._cal_index]
+        if missing and self.calibration:
+            logger.warning("No calibration for servos %s", missing)
+        self.is_calibrated = not missing
+
+        self._cal_zero = zero
+        self._cal_sign = np.where(min_pos > max_pos, -1.0, 1.0)
+        self._cal_pos_range = np.abs(np.maximum(min_pos, max_pos) - zero).astype(np.float64)
+        self._cal_neg_range = np.abs(zero - np.minimum(min_pos, max_pos)).astype(np.float64)
+        flat = min_pos == max_pos
+        self._cal_pos_scale = self._angle_scale(self._cal_pos_range, flat)
+        self._cal_neg_scale = self._angle_scale(self._cal_neg_range, flat)
+
+        # The same constants as Python scalars for the per-servo helpers
+        self._cal_to_angle = {}
+        self._cal_to_position = {}
+        for servo_id, idx in self._cal_index.items():
+            zero_i = int(zero[idx])
+            sign_i = float(self._cal_sign[idx])
+            self._cal_to_angle[servo_id] = (
+                zero_i, sign_i, float(self._cal_pos_scale[idx]), float(self._cal_neg_scale[idx]))
+            self._cal_to_position[servo_id] = (
+                zero_i, sign_i, float(self._cal_pos_range[idx]), float(self._cal_neg_range[idx]))
+
+    @staticmethod
+    def _angle_scale(span, flat):
+        scale = np.divide(90.0, span, out=np.zeros_like(span), where=span != 0)
+        scale[flat] = 0.0
+        return scale
+
+    def _cal_take(self, servo_ids, *arrays):
+        if servo_ids is None:
+            return arrays
+        idx = np.fromiter((self._cal_index[servo_id] for servo_id in servo_ids),
+                          dtype=np.intp, count=len(servo_ids))
+        return tuple(array[idx] for array in arrays)
+
+    # Batch conversions over whole arrays. Values are ordered like servo_ids,
+    # or like get_servos() when servo_ids is None.
+    def positions_to_angles(self, positions, servo_ids=None):
+        assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
+
+        zero, sign, pos_scale, neg_scale = self._cal_take(
+            servo_ids, self._cal_zero, self._cal_sign, self._cal_pos_scale, self._cal_neg_scale)
+        delta = np.asarray(positions, dtype=np.float64) - zero
+        return sign * delta * np.where(delta > 0, pos_scale, neg_scale)
+
+    def angles_to_positions(self, angles, servo_ids=None):
+        assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
+
+        zero, sign, pos_range, neg_range = self._cal_take(
+            servo_ids, self._cal_zero, self._cal_sign, self._cal_pos_range, self._cal_neg_range)
+        working = sign * np.asarray(angles, dtype=np.float64)
+        rng = np.where(working > 0, pos_range, neg_range)
+        positions = zero + working / 90.0 * rng
+        # A NaN, inf or out-of-range float would cast to INT_MIN and wrap to
+        # an arbitrary goal, so refuse it like int() does
+        if not (np.isfinite(positions).all() and np.abs(positions).max(initial=0) < 2**31):
+            raise ValueError(f"Invalid angles: {angles}")
+        # astype truncates toward zero, like int()
+        return positions.astype(np.int32)
+
     def _position_to_angle(self, servo_id, position):
         assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
-        
-        servo_id_str = str(servo_id)
-        zero = self.calibration[servo_id_str]['zero']
-        min_pos = self.calibration[servo_id_str]['min']
-        max_pos = self.calibration[servo_id_str]['max']
-        
-        if position == zero:
-            return 0.0
-            
-        is_reversed = min_pos > max_pos
-        
-        # For reversed servos, swap min and max to calculate correctly
-        actual_min = max_pos if is_reversed else min_pos
-        actual_max = min_pos if is_reversed else max_pos
-        
-        # Calculate full range and position relative to zero
-        full_range = abs(actual_max - actual_min)
-        if full_range == 0:
-            return 0.0  # Prevent division by zero
-            
-        if position > zero:
-            # Positive angle range (0 to 90)
-            pos_range = abs(actual_max - zero)
-            if pos_range == 0:
-                return 0.0
-            
-            relative_pos = abs(position - zero)
-            angle = 90.0 * relative_pos / pos_range
-            
-            # If reversed and position > zero, we're in negative angle territory
-            return -angle if is_reversed else angle
-        else:
-            # Negative angle range (0 to -90)
-            neg_range = abs(zero - actual_min)
-            if neg_range == 0:
-                return 0.0
-                
-            relative_pos = abs(zero - position)
-            angle = 90.0 * relative_pos / neg_range
-            
-            # If reversed and position < zero, we're in positive angle territory
-            return angle if is_reversed else -angle
-        
+        return _pos2ang_core(int(position), *self._cal_to_angle[servo_id])
+
     def _angle_to_position(self, servo_id, angle):
         assert self.is_calibrated, "Servos not calibrated. Run calibration procedure first."
-        
-        servo_id_str = str(servo_id)
-        zero = self.calibration[servo_id_str]['zero']
-        min_pos = self.calibration[servo_id_str]['min']
-        max_pos = self.calibration[servo_id_str]['max']
-        
-        if angle == 0.0:
-            return zero
-            
-        is_reversed = min_pos > max_pos
-        
-        # For reversed servos, swap min and max to calculate correctly
-        actual_min = max_pos if is_reversed else min_pos
-        actual_max = min_pos if is_reversed else max_pos
-        
-        # Reverse the angle for reversed servos
-        working_angle = -angle if is_reversed else angle
-        
-        if working_angle > 0:
-            # Positive angle range (0 to 90)
-            pos_range = abs(actual_max - zero)
-            return int(zero + (working_angle / 90.0 * pos_range))
-        else:
-            # Negative angle range (0 to -90)
-            neg_range = abs(zero - actual_min)
-            return int(zero - (abs(working_angle) / 90.0 * neg_range)) 
\ No newline at end of file
+        return _ang2pos_core(float(angle), *self._cal_to_position[servo_id])
@@ -1,4 +1,5 @@
 from core.servos import Servos
+import logging
 import time
 
 def calibrate_servos():
@@ -108,9 +109,35 @@ def test_angle_conversion():
     finally:
         servos.disconnect()
 
+def test_wait_for_position():
+    """
+    Command every servo to its zero position and check that wait_for_position
+    reports it settled there.
+    """
+    servos = Servos()
+    
+    try:
+        servos.connect()
+        targets = {servo_id: int(servos._cal_zero[idx])
+                   for servo_id, idx in servos._cal_index.items()}
+        
+        start = time.monotonic()
+        servos.set_position(targets)
+        reached = servos.wait_for_position(targets)
+        elapsed = time.monotonic() - start
+        
+        positions = servos.get_positions()
+        print(f"Reached zero: {reached} after {elapsed:.2f}s")
+        for servo_id, target in targets.items():
+            print(f"Servo {servo_id}: target {target}, actual {positions[servo_id]}")
+    finally:
+        servos.disconnect()
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Choose which calibration method to run
-    method = input("Choose calibration method (1: Manual, 2: Iterative, 3: Test Angles): ")
+    method = input("Choose calibration method (1: Manual, 2: Iterative, 3: Test Angles, 4: Test Wait): ")
     
     if method == "1":
         print("\nRunning manual calibration...")
@@ -118,6 +145,9 @@ if __name__ == "__main__":
     elif method == "3":
         print("\nRunning angle conversion tests...")
         test_angle_conversion()
+    elif method == "4":
+        print("\nRunning wait_for_position test...")
+        test_wait_for_position()
     else:
         print("\nRunning iterative calibration...")
         run_iterative_calibration()
@@ -4,6 +4,7 @@ Simplified servo calibration script.
 Calibrates each servo at 0°, +90°, and -90° positions sequentially.
 """
 import sys
+import logging
 import os
 import time
 import json
@@ -135,4 +136,5 @@ def main():
             controller.disconnect()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main() 
\ No newline at end of file
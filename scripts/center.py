@@ -3,6 +3,7 @@
 Script to center all servos.
 """
 import argparse
+import logging
 from servo_controller import ServoController
 import time
 def main():
@@ -23,4 +24,5 @@ def main():
         print(f"Error centering servos: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main() 
\ No newline at end of file
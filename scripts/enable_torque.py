@@ -3,6 +3,7 @@
 Script to enable torque on all servos.
 """
 import argparse
+import logging
 from servo_controller import ServoController
 import time
 
@@ -25,4 +26,5 @@ def main():
         print(f"Error enabling torque on servos: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main() 
\ No newline at end of file
@@ -6,7 +6,6 @@ before and after connecting the device.
 
 import os
 import time
-from pathlib import Path
 import serial.tools.list_ports
 
 
@@ -15,7 +14,8 @@ def find_available_ports():
     if os.name == "nt":  # Windows
         ports = [port.device for port in serial.tools.list_ports.comports()]
     else:  # Linux/macOS
-        ports = [str(path) for path in Path("/dev").glob("tty*")]
+        with os.scandir("/dev") as entries:
+            ports = [f"/dev/{entry.name}" for entry in entries if entry.name.startswith("tty")]
     return ports
 
 
@@ -1,4 +1,5 @@
 import argparse
+import logging
 from core.servos import Servos
 import time
 
@@ -15,4 +16,5 @@ def main():
   # controller.disconnect()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main() 
\ No newline at end of file
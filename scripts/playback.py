@@ -1,5 +1,6 @@
 # playback.py
 import time
+import logging
 import json
 import sys
 import os
@@ -53,4 +54,5 @@ def main():
     controller.disconnect()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
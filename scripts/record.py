@@ -1,5 +1,6 @@
 # record.py
 import time
+import logging
 import json
 import os
 from servo_controller import ServoController
@@ -58,4 +59,5 @@ def main():
     print(f"Saved recording to {filename}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
@@ -11,8 +11,13 @@ Controls six servos (1-6) for a robotic arm:
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import Any
 import json
+import orjson
+import ormsgpack
+import struct
 import time
 import argparse
 import os
@@ -21,6 +26,9 @@ import traceback
 import logging
 import uvicorn
 import asyncio
+import collections
+import contextlib
+import itertools
 from servo_controller import ServoController
 import datetime
 
@@ -29,8 +37,17 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('servo-server')
 
-# Create the FastAPI app
-app = FastAPI()
+# Event loop the server runs on; the broadcast thread hands messages to it
+loop = None
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    global loop
+    loop = asyncio.get_running_loop()
+    yield
+
+# Create the FastAPI app; JSON responses are rendered with orjson
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Initialize the servo controller with appropriate port
 servo_controller = None
@@ -48,8 +65,8 @@ last_known_positions = {
 # Store active WebSocket connections
 active_ws_connections = set()
 
-# Track last broadcast positions to only send changes
-last_broadcast_positions = {}
+# Fingerprint of the last broadcast positions, used to only send changes
+last_broadcast_fingerprint = None
 
 # Flag to indicate if calibration is in progress
 calibrating = False
@@ -64,56 +81,209 @@ SERVO_IDS = {
     'grip': 6
 }
 
+# Per-client outgoing buffer size; a client this far behind is considered stalled
+CLIENT_QUEUE_SIZE = 32
+# How long a broadcast waits on a full client buffer before dropping that client
+SLOW_CLIENT_TIMEOUT = 1.0
+# Messages arriving this soon after a send are coalesced into one batch frame
+BATCH_INTERVAL = 0.005
+
+# Outgoing message buffer for a single WebSocket client. There is exactly one
+# consumer (the client's sender task), so a deque plus a single wakeup future
+# replaces asyncio.Queue and its getter bookkeeping. `fmt` is the wire format
+# the client asked for ('json' or 'msgpack').
+class ClientChannel:
+    def __init__(self, client_id: int, fmt: str = 'json', maxsize: int = CLIENT_QUEUE_SIZE):
+        self.client_id = client_id
+        self.fmt = fmt
+        self.maxsize = maxsize
+        self._buf = collections.deque()
+        self._waiter: asyncio.Future | None = None
+        self._putters = collections.deque()
+
+    def put_nowait(self, message):
+        if len(self._buf) >= self.maxsize:
+            raise asyncio.QueueFull
+        self._buf.append(message)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def put(self, message):
+        # Slow path for a full buffer: wait for the consumer to make room
+        while len(self._buf) >= self.maxsize:
+            putter = asyncio.get_running_loop().create_future()
+            self._putters.append(putter)
+            try:
+                await putter
+            finally:
+                if putter in self._putters:
+                    self._putters.remove(putter)
+        self.put_nowait(message)
+
+    async def get(self):
+        while not self._buf:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        message = self._buf.popleft()
+        while self._putters:
+            putter = self._putters.popleft()
+            if not putter.done():
+                putter.set_result(None)
+                break
+        return message
+
+    def drain(self):
+        messages = list(self._buf)
+        self._buf.clear()
+        while self._putters:
+            putter = self._putters.popleft()
+            if not putter.done():
+                putter.set_result(None)
+        return messages
+
+# Monotonic WebSocket client ids, used to tell connections apart in the logs
+_client_seq = itertools.count(1)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: set[WebSocket] = set()
+        self.channels: dict[WebSocket, ClientChannel] = {}
+        self.senders: dict[WebSocket, asyncio.Task] = {}
+        # Immutable (websocket, channel) snapshot for broadcasts; rebuilt only on connect/disconnect
+        self.snapshot: tuple[tuple[WebSocket, ClientChannel], ...] = ()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.add(websocket)
-        logger.info(f"New WebSocket connection established. Total connections: {len(self.active_connections)}")
+        # Position broadcasts are JSON text frames by default, binary MessagePack with ?fmt=msgpack
+        fmt = 'msgpack' if websocket.query_params.get('fmt') == 'msgpack' else 'json'
+        channel = ClientChannel(next(_client_seq), fmt)
+        self.channels[websocket] = channel
+        self.snapshot = tuple(self.channels.items())
+        self.senders[websocket] = asyncio.create_task(self._send_loop(websocket, channel))
+        logger.info(f"New WebSocket connection established (client {channel.client_id}, {fmt}). Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
+        if websocket not in self.active_connections:
+            return
         self.active_connections.remove(websocket)
-        logger.info(f"WebSocket connection closed. Remaining connections: {len(self.active_connections)}")
+        channel = self.channels.pop(websocket, None)
+        self.snapshot = tuple(self.channels.items())
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            sender.cancel()
+        client_id = channel.client_id if channel else '?'
+        logger.info(f"WebSocket connection closed (client {client_id}). Remaining connections: {len(self.active_connections)}")
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
+        # Clients that already went away are skipped up front rather than failing in send
+        if websocket not in self.channels:
+            return
         try:
             await websocket.send_text(message)
         except Exception as e:
             logger.error(f"Error sending message: {e}")
-            
-    async def broadcast(self, message: str):
-        disconnected_websockets = set()
-        for connection in self.active_connections:
+
+    async def _send_loop(self, websocket: WebSocket, channel: ClientChannel):
+        # Drain this client's channel so one slow socket never delays the others.
+        # The first message after an idle period is sent immediately; anything
+        # queued within BATCH_INTERVAL of it goes out as a single batch frame.
+        # Frames are pre-encoded: JSON as str sent in text frames, MessagePack
+        # as bytes sent in binary frames.
+        send = websocket.send_text if channel.fmt == 'json' else websocket.send_bytes
+        while True:
+            message = await channel.get()
             try:
-                await connection.send_text(message)
+                await send(message)
+                await asyncio.sleep(BATCH_INTERVAL)
+                pending = channel.drain()
+                if len(pending) == 1:
+                    await send(pending[0])
+                elif pending:
+                    await send(BATCH_ENCODERS[channel.fmt](pending))
             except Exception as e:
                 logger.error(f"Error broadcasting: {e}")
-                disconnected_websockets.add(connection)
-        
-        # Remove disconnected websockets
-        for ws in disconnected_websockets:
-            self.active_connections.remove(ws)
+                self.disconnect(websocket)
+                return
+
+    async def _put_with_timeout(self, websocket: WebSocket, channel: ClientChannel, message):
+        try:
+            await asyncio.wait_for(channel.put(message), SLOW_CLIENT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping WebSocket client {channel.client_id}: stopped reading broadcasts")
+            self.disconnect(websocket)
+            try:
+                await asyncio.wait_for(websocket.close(), SLOW_CLIENT_TIMEOUT)
+            except Exception:
+                pass
+
+    async def broadcast(self, message: dict):
+        # Encode once per wire format in use, not once per client
+        frames = {}
+        # Fast path: enqueue without yielding; only full channels take the slow path
+        slow = []
+        for websocket, channel in self.snapshot:
+            frame = frames.get(channel.fmt)
+            if frame is None:
+                frame = frames[channel.fmt] = ENCODERS[channel.fmt](message)
+            try:
+                channel.put_nowait(frame)
+            except asyncio.QueueFull:
+                slow.append((websocket, channel, frame))
+
+        if slow:
+            await asyncio.gather(*(self._put_with_timeout(ws, ch, frame) for ws, ch, frame in slow))
 
 manager = ConnectionManager()
 
-# Get the current event loop for broadcasting
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+# Serialize outgoing messages with orjson (angles from the controller may be numpy scalars)
+def encode_message(message):
+    return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# Broadcast frames are encoded once per format and shared by every client:
+# JSON as text for send_text, MessagePack as bytes for send_bytes
+def encode_json(message):
+    return encode_message(message)
+
+def encode_msgpack(message):
+    return ormsgpack.packb(message, option=ormsgpack.OPT_SERIALIZE_NUMPY)
+
+# Batch envelopes are prebuilt once: {'type': 'batch', 'frames': [...]} with the
+# already-encoded frames spliced in as array items, so batching never re-serializes
+_JSON_BATCH_HEAD = encode_json({'type': 'batch', 'frames': []})[:-2]
+_JSON_BATCH_TAIL = ']}'
+
+def encode_json_batch(frames):
+    return _JSON_BATCH_HEAD + ','.join(frames) + _JSON_BATCH_TAIL
+
+_MSGPACK_BATCH_HEAD = b'\x82' + ormsgpack.packb('type') + ormsgpack.packb('batch') + ormsgpack.packb('frames')
+
+def encode_msgpack_batch(frames):
+    return _MSGPACK_BATCH_HEAD + b'\xdc' + struct.pack('>H', len(frames)) + b''.join(frames)
+
+ENCODERS = {'json': encode_json, 'msgpack': encode_msgpack}
+BATCH_ENCODERS = {'json': encode_json_batch, 'msgpack': encode_msgpack_batch}
 
 # Periodically broadcast servo positions to all connected WebSocket clients
+def position_fingerprint(positions):
+    # Bucket angles to 0.5 degrees so jitter below the broadcast threshold compares equal
+    return tuple(round(value * 2) for value in positions.values())
+
 def broadcast_positions():
-    global last_broadcast_positions, calibrating
+    global last_broadcast_fingerprint, calibrating
     
     logger.info("Starting WebSocket broadcast thread")
     
     # Initialize last broadcast with current positions
     if servo_controller and servo_controller._is_connected:
-        last_broadcast_positions = servo_controller.get_angles().copy()
+        last_broadcast_fingerprint = position_fingerprint(servo_controller.get_angles())
     else:
-        last_broadcast_positions = last_known_positions.copy()
+        last_broadcast_fingerprint = position_fingerprint(last_known_positions)
         
     broadcast_interval = 0.25  # Reduce to 4 updates per second (250ms)
     
@@ -126,7 +296,6 @@ def broadcast_positions():
                 
             if manager.active_connections:
                 positions = {}
-                has_changes = False
                 
                 # Get actual positions if connected to hardware
                 if servo_controller and servo_controller._is_connected:
@@ -141,28 +310,21 @@ def broadcast_positions():
                     # Return simulation data
                     positions = last_known_positions
                 
-                # Check if positions have changed enough to broadcast
-                for key, value in positions.items():
-                    last_value = last_broadcast_positions.get(key, 0)
-                    # Only consider change significant if >0.5 degrees
-                    if abs(value - last_value) > 0.5:
-                        has_changes = True
-                        break
-                
-                # Only broadcast if there are changes or it's been a while
-                if has_changes or not last_broadcast_positions:
-                    # Prepare message for broadcast - explicitly set type to broadcast to distinguish from responses
-                    message = json.dumps({
+                # Skip serialization and broadcast entirely when nothing moved
+                fingerprint = position_fingerprint(positions)
+                if fingerprint != last_broadcast_fingerprint:
+                    # Prepare message for broadcast - explicitly set type to broadcast to distinguish from responses.
+                    # Encoded once per wire format and shared by every client.
+                    message = {
                         'type': 'servo_positions',
-                        'positions': positions,
+                        'positions': dict(positions),
                         'broadcast': True  # Indicate this is a broadcast, not a response
-                    })
+                    }
                     
                     # Use asyncio to broadcast the message
                     asyncio.run_coroutine_threadsafe(manager.broadcast(message), loop)
                     
-                    # Update last broadcast positions
-                    last_broadcast_positions = positions.copy()
+                    last_broadcast_fingerprint = fingerprint
             
             # Sleep for a short period before next update
             time.sleep(broadcast_interval)
@@ -176,9 +338,393 @@ def broadcast_positions():
 async def get_index():
     return FileResponse(os.path.join(os.path.dirname(__file__), 'templates', 'index.html'))
 
+# Incoming WebSocket message. Validated straight from the raw JSON text by
+# pydantic's Rust core; fields a message type doesn't use stay None. Payload
+# fields are left as Any so values reach the handlers exactly as the client
+# sent them, and the handlers do their own coercion as before.
+class WSMessage(BaseModel):
+    type: str | None = None
+    requestId: Any = None
+    servo_id: Any = None
+    position: Any = None
+    joint: Any = None
+    angle: Any = None
+    step_number: Any = None
+
+async def handle_servo_update(websocket: WebSocket, msg: WSMessage):
+    servo_id = msg.servo_id
+    position = msg.position
+
+    if servo_id and position is not None:
+        # Process servo update
+        ui_position = max(-90.0, min(90.0, float(position)))
+        last_known_positions[servo_id] = ui_position
+
+        if servo_controller and servo_controller._is_connected:
+            servo_controller.move({servo_id: position})
+            logger.info(f"WS: Moved {servo_id} to {position}° (UI: {ui_position}°)")
+
+            # Read back the actual position to confirm
+            actual_pos = None
+            if servo_id in servo_controller.servos:
+                actual_angles = servo_controller.get_angles()
+                actual_pos = actual_angles.get(servo_id, position)
+        else:
+            logger.info(f"WS Simulation: Would move {servo_id} to {position}° (UI: {ui_position}°)")
+
+        # Send acknowledgment
+        await websocket.send_text(encode_message({
+            'type': 'ack',
+            'requestId': msg.requestId,
+            'status': 'success',
+            'servo_id': servo_id,
+            'position': ui_position
+        }))
+
+async def handle_center_all(websocket: WebSocket, msg: WSMessage):
+    # Center all servos
+    for key in last_known_positions:
+        last_known_positions[key] = 0
+
+    if servo_controller and servo_controller._is_connected:
+        servo_controller.center()
+        logger.info("WS: Centered all servos")
+    else:
+        logger.info("WS Simulation: Would center all servos")
+
+    # Send acknowledgment
+    await websocket.send_text(encode_message({
+        'type': 'ack',
+        'requestId': msg.requestId,
+        'status': 'success'
+    }))
+
+async def handle_start_calibration(websocket: WebSocket, msg: WSMessage):
+    global calibrating
+
+    # Enter calibration mode
+    calibrating = True
+    logger.info("Entering calibration mode")
+
+    if servo_controller and servo_controller._is_connected:
+        # Disable torque on all servos
+        servo_controller._write("Torque_Enable", 0)
+        logger.info("Disabled torque on all servos for calibration")
+
+        # Send acknowledgment that torque is released
+        await websocket.send_text(encode_message({
+            'type': 'ack', 
+            'message': 'torque_released'
+        }))
+
+        # Send first calibration step - waiting for UI to send capture commands
+        try:
+            # Initialize calibration data structure
+            calibration_data = {}
+
+            # Get all servo IDs and names
+            servo_items = list(servo_controller.servos.items())
+
+            # Send initial calibration step
+            if servo_items:
+                first_joint, first_id = servo_items[0]
+                await websocket.send_text(encode_message({
+                    'type': 'calibration_step',
+                    'joint': first_joint,
+                    'angle': 0,
+                    'total_steps': len(servo_items) * 3,
+                    'current_step': 1
+                }))
+        except Exception as e:
+            logger.error(f"Error starting calibration: {e}")
+            logger.error(traceback.format_exc())
+            await websocket.send_text(encode_message({
+                'type': 'error',
+                'message': f'Calibration error: {str(e)}'
+            }))
+            calibrating = False
+    else:
+        # Simulation mode
+        logger.info("WS Simulation: Would start calibration")
+
+        # Send acknowledgment
+        await websocket.send_text(encode_message({
+            'type': 'ack', 
+            'message': 'torque_released'
+        }))
+
+        # Send first calibration step
+        servo_names = ['base_yaw', 'pitch', 'pitch2', 'pitch3', 'roll', 'grip']
+        angles = [0, 90, -90]  # Define the angle sequence explicitly
+        first_step = 1
+
+        logger.info(f"Starting calibration simulation with {len(servo_names)} joints, {len(angles)} angles per joint, total {len(servo_names) * len(angles)} steps")
+        logger.info(f"First step: {first_step}/{len(servo_names) * len(angles)} - Joint: {servo_names[0]}, Angle: {angles[0]}°")
+
+        await websocket.send_text(encode_message({
+            'type': 'calibration_step',
+            'joint': servo_names[0],
+            'angle': angles[0],
+            'total_steps': len(servo_names) * len(angles),
+            'current_step': first_step
+        }))
+
+async def handle_capture_position(websocket: WebSocket, msg: WSMessage):
+    global calibrating
+
+    # Handle position capture for calibration
+    if calibrating:
+        joint_name = msg.joint
+        angle = msg.angle
+        step_number = msg.step_number
+
+        logger.info(f"Capturing position for {joint_name} at {angle}° (step {step_number}) - Raw data: {msg}")
+
+        # Ensure step_number is an integer, default to 1 if missing
+        if step_number is None:
+            step_number = 1
+            logger.warning(f"Missing step_number in capture_position request, defaulting to {step_number}")
+        else:
+            try:
+                step_number = int(step_number)
+            except (ValueError, TypeError):
+                logger.warning(f"Invalid step_number format: {step_number}, defaulting to 1")
+                step_number = 1
+
+        logger.info(f"Processing capture for step {step_number}: {joint_name} at {angle}°")
+
+        if servo_controller and servo_controller._is_connected:
+            # Get the current position from the servo
+            servo_id = servo_controller.servos.get(joint_name)
+            if servo_id:
+                position = servo_controller._read("Present_Position", [servo_id])[0]
+
+                # Store calibration point
+                if not hasattr(servo_controller, 'calibration_progress'):
+                    servo_controller.calibration_progress = {}
+
+                if str(servo_id) not in servo_controller.calibration_progress:
+                    servo_controller.calibration_progress[str(servo_id)] = {}
+
+                # Save the position according to angle
+                if angle == 0:
+                    servo_controller.calibration_progress[str(servo_id)]["zero"] = int(position)
+                elif angle == 90:
+                    servo_controller.calibration_progress[str(servo_id)]["max"] = int(position)
+                elif angle == -90:
+                    servo_controller.calibration_progress[str(servo_id)]["min"] = int(position)
+
+                # Notify UI of successful capture
+                await websocket.send_text(encode_message({
+                    'type': 'position_captured',
+                    'joint': joint_name,
+                    'angle': angle,
+                    'position': int(position)
+                }))
+
+                # Calculate next step - regardless of what the client sent, 
+                # we know what the next step should be
+                servo_items = list(servo_controller.servos.items())
+                total_steps = len(servo_items) * 3
+
+                # Move to next step - explicitly calculate based on current joint/angle
+                current_joint_index = 0
+                current_angle_index = 0
+                angles = [0, 90, -90]  # Define the angle sequence
+
+                # Find the current joint index in our list
+                for i, (joint, _) in enumerate(servo_items):
+                    if joint == joint_name:
+                        current_joint_index = i
+                        break
+
+                # Find the current angle index
+                for i, a in enumerate(angles):
+                    if a == angle:
+                        current_angle_index = i
+                        break
+
+                # Calculate the next angle index and joint index
+                next_angle_index = (current_angle_index + 1) % len(angles)
+                next_joint_index = current_joint_index
+
+                # If we've gone through all angles for this joint, move to the next joint
+                if next_angle_index == 0:
+                    next_joint_index = current_joint_index + 1
+
+                # Calculate the absolute step number
+                next_step = next_joint_index * len(angles) + next_angle_index + 1
+
+                logger.info(f"Calculated next step: {next_step}/{total_steps} - " +
+                           f"joint_index={next_joint_index}, angle_index={next_angle_index}")
+
+                if next_step <= total_steps:
+                    if next_joint_index < len(servo_items):
+                        next_joint, next_id = servo_items[next_joint_index]
+                        next_angle = angles[next_angle_index]
+
+                        logger.info(f"Sending next step: {next_step}/{total_steps} - Joint: {next_joint}, Angle: {next_angle}°")
+
+                        # Send next calibration step
+                        await websocket.send_text(encode_message({
+                            'type': 'calibration_step',
+                            'joint': next_joint,
+                            'angle': next_angle,
+                            'total_steps': total_steps,
+                            'current_step': next_step
+                        }))
+                else:
+                    # All steps completed
+                    # Save calibration data
+                    servo_controller.calibration = servo_controller.calibration_progress
+                    servo_controller.calibration["timestamp"] = datetime.datetime.now().isoformat()
+
+                    try:
+                        with open(servo_controller.calibration_file, 'w') as f:
+                            json.dump(servo_controller.calibration, f, indent=2)
+                        logger.info(f"Saved calibration to {servo_controller.calibration_file}")
+
+                        # Ensure calibration is properly loaded after saving
+                        # This is important for proper angle calculations
+                        if hasattr(servo_controller, 'load_calibration'):
+                            servo_controller.load_calibration()
+                            logger.info("Reloaded calibration data after saving")
+                        else:
+                            # If load_calibration doesn't exist, ensure the calibration is properly set
+                            logger.info("No load_calibration method available, using calibration directly")
+                    except Exception as e:
+                        logger.error(f"Error saving calibration: {e}")
+
+                    # Re-enable torque
+                    servo_controller._write("Torque_Enable", 1)
+
+                    # Get current angles for sending
+                    positions = servo_controller.get_angles()
+
+                    # Log the angles for debugging
+                    logger.info("Sending calibration_complete with positions:")
+                    for joint, angle in positions.items():
+                        logger.info(f"  {joint}: {angle}°")
+
+                    # Send calibration complete
+                    await websocket.send_text(encode_message({
+                        'type': 'calibration_complete',
+                        'positions': positions
+                    }))
+
+                    # Reset calibration flag
+                    calibrating = False
+                    logger.info("Calibration completed successfully!")
+        else:
+            # Simulation mode
+            # Log for debugging
+            logger.info(f"Simulating position capture for {joint_name} at {angle}° (step {step_number})")
+
+            # Send success message
+            await websocket.send_text(encode_message({
+                'type': 'position_captured',
+                'joint': joint_name,
+                'angle': angle,
+                'position': 2048  # Simulated center position
+            }))
+
+            # Calculate next step - same logic as above
+            servo_items = list(SERVO_IDS.items())
+            total_steps = len(servo_items) * 3
+
+            # Move to next step - explicitly calculate based on current joint/angle
+            current_joint_index = 0
+            current_angle_index = 0
+            angles = [0, 90, -90]  # Define the angle sequence
+
+            # Find the current joint index in our list
+            for i, (joint, _) in enumerate(servo_items):
+                if joint == joint_name:
+                    current_joint_index = i
+                    break
+
+            # Find the current angle index
+            for i, a in enumerate(angles):
+                if a == angle:
+                    current_angle_index = i
+                    break
+
+            # Calculate the next angle index and joint index
+            next_angle_index = (current_angle_index + 1) % len(angles)
+            next_joint_index = current_joint_index
+
+            # If we've gone through all angles for this joint, move to the next joint
+            if next_angle_index == 0:
+                next_joint_index = current_joint_index + 1
+
+            # Calculate the absolute step number
+            next_step = next_joint_index * len(angles) + next_angle_index + 1
+
+            logger.info(f"Simulation - Calculated next step: {next_step}/{total_steps} - " +
+                       f"joint_index={next_joint_index}, angle_index={next_angle_index}")
+
+            if next_step <= total_steps:
+                if next_joint_index < len(servo_items):
+                    next_joint, next_id = servo_items[next_joint_index]
+                    next_angle = angles[next_angle_index]
+
+                    logger.info(f"Simulation - Sending next step: {next_step}/{total_steps} - Joint: {next_joint}, Angle: {next_angle}°")
+
+                    # Send next calibration step
+                    await websocket.send_text(encode_message({
+                        'type': 'calibration_step',
+                        'joint': next_joint,
+                        'angle': next_angle,
+                        'total_steps': total_steps,
+                        'current_step': next_step
+                    }))
+            else:
+                # All steps completed - send complete message
+                await websocket.send_text(encode_message({
+                    'type': 'calibration_complete',
+                    'positions': last_known_positions
+                }))
+
+                # Reset calibration flag
+                calibrating = False
+                logger.info("Simulation: Calibration completed successfully!")
+    else:
+        # Not in calibration mode
+        await websocket.send_text(encode_message({
+            'type': 'error',
+            'message': 'Not in calibration mode'
+        }))
+
+async def handle_get_positions(websocket: WebSocket, msg: WSMessage):
+    # Get current positions
+    positions = {}
+    if servo_controller and servo_controller._is_connected:
+        positions = servo_controller.get_angles()
+        # Ensure all angles are properly clamped for UI display
+        for key, value in positions.items():
+            positions[key] = max(-90.0, min(90.0, float(value)))
+            last_known_positions[key] = positions[key]
+    else:
+        positions = last_known_positions
+
+    # Send response with positions
+    await websocket.send_text(encode_message({
+        'type': 'ack',
+        'requestId': msg.requestId,
+        'status': 'success',
+        'positions': positions
+    }))
+
+MESSAGE_HANDLERS = {
+    'servo_update': handle_servo_update,
+    'center_all': handle_center_all,
+    'start_calibration': handle_start_calibration,
+    'capture_position': handle_capture_position,
+    'get_positions': handle_get_positions,
+}
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    global calibrating
     await manager.connect(websocket)
     
     try:
@@ -194,7 +740,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 positions = last_known_positions
                 
             # Send initial positions
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(encode_message({
                 'type': 'servo_positions',
                 'positions': positions
             }))
@@ -209,404 +755,46 @@ async def websocket_endpoint(websocket: WebSocket):
             logger.info(f"Received WebSocket message: {message}")
             
             # Process message
+            request_id = None
             try:
-                data = json.loads(message)
-                request_id = data.get('requestId')
-                
-                # Handle different message types
-                if data.get('type') == 'servo_update':
-                    servo_id = data.get('servo_id')
-                    position = data.get('position')
-                    
-                    if servo_id and position is not None:
-                        # Process servo update
-                        ui_position = max(-90.0, min(90.0, float(position)))
-                        last_known_positions[servo_id] = ui_position
-                        
-                        if servo_controller and servo_controller._is_connected:
-                            servo_controller.move({servo_id: position})
-                            logger.info(f"WS: Moved {servo_id} to {position}° (UI: {ui_position}°)")
-                            
-                            # Read back the actual position to confirm
-                            actual_pos = None
-                            if servo_id in servo_controller.servos:
-                                actual_angles = servo_controller.get_angles()
-                                actual_pos = actual_angles.get(servo_id, position)
-                        else:
-                            logger.info(f"WS Simulation: Would move {servo_id} to {position}° (UI: {ui_position}°)")
-                            
-                        # Send acknowledgment
-                        await websocket.send_text(json.dumps({
-                            'type': 'ack',
-                            'requestId': request_id,
-                            'status': 'success',
-                            'servo_id': servo_id,
-                            'position': ui_position
-                        }))
-                
-                elif data.get('type') == 'center_all':
-                    # Center all servos
-                    for key in last_known_positions:
-                        last_known_positions[key] = 0
-                        
-                    if servo_controller and servo_controller._is_connected:
-                        servo_controller.center()
-                        logger.info("WS: Centered all servos")
-                    else:
-                        logger.info("WS Simulation: Would center all servos")
-                        
-                    # Send acknowledgment
-                    await websocket.send_text(json.dumps({
-                        'type': 'ack',
-                        'requestId': request_id,
-                        'status': 'success'
-                    }))
-                
-                elif data.get('type') == 'start_calibration':
-                    # Enter calibration mode
-                    calibrating = True
-                    logger.info("Entering calibration mode")
-                    
-                    if servo_controller and servo_controller._is_connected:
-                        # Disable torque on all servos
-                        servo_controller._write("Torque_Enable", 0)
-                        logger.info("Disabled torque on all servos for calibration")
-                        
-                        # Send acknowledgment that torque is released
-                        await websocket.send_text(json.dumps({
-                            'type': 'ack', 
-                            'message': 'torque_released'
-                        }))
-                        
-                        # Send first calibration step - waiting for UI to send capture commands
-                        try:
-                            # Initialize calibration data structure
-                            calibration_data = {}
-                            
-                            # Get all servo IDs and names
-                            servo_items = list(servo_controller.servos.items())
-                            
-                            # Send initial calibration step
-                            if servo_items:
-                                first_joint, first_id = servo_items[0]
-                                await websocket.send_text(json.dumps({
-                                    'type': 'calibration_step',
-                                    'joint': first_joint,
-                                    'angle': 0,
-                                    'total_steps': len(servo_items) * 3,
-                                    'current_step': 1
-                                }))
-                        except Exception as e:
-                            logger.error(f"Error starting calibration: {e}")
-                            logger.error(traceback.format_exc())
-                            await websocket.send_text(json.dumps({
-                                'type': 'error',
-                                'message': f'Calibration error: {str(e)}'
-                            }))
-                            calibrating = False
-                    else:
-                        # Simulation mode
-                        logger.info("WS Simulation: Would start calibration")
-                        
-                        # Send acknowledgment
-                        await websocket.send_text(json.dumps({
-                            'type': 'ack', 
-                            'message': 'torque_released'
-                        }))
-                        
-                        # Send first calibration step
-                        servo_names = ['base_yaw', 'pitch', 'pitch2', 'pitch3', 'roll', 'grip']
-                        angles = [0, 90, -90]  # Define the angle sequence explicitly
-                        first_step = 1
-                        
-                        logger.info(f"Starting calibration simulation with {len(servo_names)} joints, {len(angles)} angles per joint, total {len(servo_names) * len(angles)} steps")
-                        logger.info(f"First step: {first_step}/{len(servo_names) * len(angles)} - Joint: {servo_names[0]}, Angle: {angles[0]}°")
-                        
-                        await websocket.send_text(json.dumps({
-                            'type': 'calibration_step',
-                            'joint': servo_names[0],
-                            'angle': angles[0],
-                            'total_steps': len(servo_names) * len(angles),
-                            'current_step': first_step
-                        }))
+                msg = WSMessage.model_validate_json(message)
+                request_id = msg.requestId
                 
-                elif data.get('type') == 'capture_position':
-                    # Handle position capture for calibration
-                    if calibrating:
-                        joint_name = data.get('joint')
-                        angle = data.get('angle')
-                        step_number = data.get('step_number')
-                        
-                        logger.info(f"Capturing position for {joint_name} at {angle}° (step {step_number}) - Raw data: {data}")
-                        
-                        # Ensure step_number is an integer, default to 1 if missing
-                        if step_number is None:
-                            step_number = 1
-                            logger.warning(f"Missing step_number in capture_position request, defaulting to {step_number}")
-                        else:
-                            try:
-                                step_number = int(step_number)
-                            except (ValueError, TypeError):
-                                logger.warning(f"Invalid step_number format: {step_number}, defaulting to 1")
-                                step_number = 1
-                        
-                        logger.info(f"Processing capture for step {step_number}: {joint_name} at {angle}°")
-                        
-                        if servo_controller and servo_controller._is_connected:
-                            # Get the current position from the servo
-                            servo_id = servo_controller.servos.get(joint_name)
-                            if servo_id:
-                                position = servo_controller._read("Present_Position", [servo_id])[0]
-                                
-                                # Store calibration point
-                                if not hasattr(servo_controller, 'calibration_progress'):
-                                    servo_controller.calibration_progress = {}
-                                
-                                if str(servo_id) not in servo_controller.calibration_progress:
-                                    servo_controller.calibration_progress[str(servo_id)] = {}
-                                    
-                                # Save the position according to angle
-                                if angle == 0:
-                                    servo_controller.calibration_progress[str(servo_id)]["zero"] = int(position)
-                                elif angle == 90:
-                                    servo_controller.calibration_progress[str(servo_id)]["max"] = int(position)
-                                elif angle == -90:
-                                    servo_controller.calibration_progress[str(servo_id)]["min"] = int(position)
-                                
-                                # Notify UI of successful capture
-                                await websocket.send_text(json.dumps({
-                                    'type': 'position_captured',
-                                    'joint': joint_name,
-                                    'angle': angle,
-                                    'position': int(position)
-                                }))
-                                
-                                # Calculate next step - regardless of what the client sent, 
-                                # we know what the next step should be
-                                servo_items = list(servo_controller.servos.items())
-                                total_steps = len(servo_items) * 3
-                                
-                                # Move to next step - explicitly calculate based on current joint/angle
-                                current_joint_index = 0
-                                current_angle_index = 0
-                                angles = [0, 90, -90]  # Define the angle sequence
-                                
-                                # Find the current joint index in our list
-                                for i, (joint, _) in enumerate(servo_items):
-                                    if joint == joint_name:
-                                        current_joint_index = i
-                                        break
-                                
-                                # Find the current angle index
-                                for i, a in enumerate(angles):
-                                    if a == angle:
-                                        current_angle_index = i
-                                        break
-                                
-                                # Calculate the next angle index and joint index
-                                next_angle_index = (current_angle_index + 1) % len(angles)
-                                next_joint_index = current_joint_index
-                                
-                                # If we've gone through all angles for this joint, move to the next joint
-                                if next_angle_index == 0:
-                                    next_joint_index = current_joint_index + 1
-                                
-                                # Calculate the absolute step number
-                                next_step = next_joint_index * len(angles) + next_angle_index + 1
-                                
-                                logger.info(f"Calculated next step: {next_step}/{total_steps} - " +
-                                           f"joint_index={next_joint_index}, angle_index={next_angle_index}")
-                                
-                                if next_step <= total_steps:
-                                    if next_joint_index < len(servo_items):
-                                        next_joint, next_id = servo_items[next_joint_index]
-                                        next_angle = angles[next_angle_index]
-                                        
-                                        logger.info(f"Sending next step: {next_step}/{total_steps} - Joint: {next_joint}, Angle: {next_angle}°")
-                                        
-                                        # Send next calibration step
-                                        await websocket.send_text(json.dumps({
-                                            'type': 'calibration_step',
-                                            'joint': next_joint,
-                                            'angle': next_angle,
-                                            'total_steps': total_steps,
-                                            'current_step': next_step
-                                        }))
-                                else:
-                                    # All steps completed
-                                    # Save calibration data
-                                    servo_controller.calibration = servo_controller.calibration_progress
-                                    servo_controller.calibration["timestamp"] = datetime.datetime.now().isoformat()
-                                    
-                                    try:
-                                        with open(servo_controller.calibration_file, 'w') as f:
-                                            json.dump(servo_controller.calibration, f, indent=2)
-                                        logger.info(f"Saved calibration to {servo_controller.calibration_file}")
-                                        
-                                        # Ensure calibration is properly loaded after saving
-                                        # This is important for proper angle calculations
-                                        if hasattr(servo_controller, 'load_calibration'):
-                                            servo_controller.load_calibration()
-                                            logger.info("Reloaded calibration data after saving")
-                                        else:
-                                            # If load_calibration doesn't exist, ensure the calibration is properly set
-                                            logger.info("No load_calibration method available, using calibration directly")
-                                    except Exception as e:
-                                        logger.error(f"Error saving calibration: {e}")
-                                    
-                                    # Re-enable torque
-                                    servo_controller._write("Torque_Enable", 1)
-                                    
-                                    # Get current angles for sending
-                                    positions = servo_controller.get_angles()
-                                    
-                                    # Log the angles for debugging
-                                    logger.info("Sending calibration_complete with positions:")
-                                    for joint, angle in positions.items():
-                                        logger.info(f"  {joint}: {angle}°")
-                                    
-                                    # Send calibration complete
-                                    await websocket.send_text(json.dumps({
-                                        'type': 'calibration_complete',
-                                        'positions': positions
-                                    }))
-                                    
-                                    # Reset calibration flag
-                                    calibrating = False
-                                    logger.info("Calibration completed successfully!")
-                        else:
-                            # Simulation mode
-                            # Log for debugging
-                            logger.info(f"Simulating position capture for {joint_name} at {angle}° (step {step_number})")
-                            
-                            # Send success message
-                            await websocket.send_text(json.dumps({
-                                'type': 'position_captured',
-                                'joint': joint_name,
-                                'angle': angle,
-                                'position': 2048  # Simulated center position
-                            }))
-                            
-                            # Calculate next step - same logic as above
-                            servo_items = list(SERVO_IDS.items())
-                            total_steps = len(servo_items) * 3
-                            
-                            # Move to next step - explicitly calculate based on current joint/angle
-                            current_joint_index = 0
-                            current_angle_index = 0
-                            angles = [0, 90, -90]  # Define the angle sequence
-                            
-                            # Find the current joint index in our list
-                            for i, (joint, _) in enumerate(servo_items):
-                                if joint == joint_name:
-                                    current_joint_index = i
-                                    break
-                            
-                            # Find the current angle index
-                            for i, a in enumerate(angles):
-                                if a == angle:
-                                    current_angle_index = i
-                                    break
-                            
-                            # Calculate the next angle index and joint index
-                            next_angle_index = (current_angle_index + 1) % len(angles)
-                            next_joint_index = current_joint_index
-                            
-                            # If we've gone through all angles for this joint, move to the next joint
-                            if next_angle_index == 0:
-                                next_joint_index = current_joint_index + 1
-                            
-                            # Calculate the absolute step number
-                            next_step = next_joint_index * len(angles) + next_angle_index + 1
-                            
-                            logger.info(f"Simulation - Calculated next step: {next_step}/{total_steps} - " +
-                                       f"joint_index={next_joint_index}, angle_index={next_angle_index}")
-                            
-                            if next_step <= total_steps:
-                                if next_joint_index < len(servo_items):
-                                    next_joint, next_id = servo_items[next_joint_index]
-                                    next_angle = angles[next_angle_index]
-                                    
-                                    logger.info(f"Simulation - Sending next step: {next_step}/{total_steps} - Joint: {next_joint}, Angle: {next_angle}°")
-                                    
-                                    # Send next calibration step
-                                    await websocket.send_text(json.dumps({
-                                        'type': 'calibration_step',
-                                        'joint': next_joint,
-                                        'angle': next_angle,
-                                        'total_steps': total_steps,
-                                        'current_step': next_step
-                                    }))
-                            else:
-                                # All steps completed - send complete message
-                                await websocket.send_text(json.dumps({
-                                    'type': 'calibration_complete',
-                                    'positions': last_known_positions
-                                }))
-                                
-                                # Reset calibration flag
-                                calibrating = False
-                                logger.info("Simulation: Calibration completed successfully!")
-                    else:
-                        # Not in calibration mode
-                        await websocket.send_text(json.dumps({
-                            'type': 'error',
-                            'message': 'Not in calibration mode'
-                        }))
-                
-                elif data.get('type') == 'get_positions':
-                    # Get current positions
-                    positions = {}
-                    if servo_controller and servo_controller._is_connected:
-                        positions = servo_controller.get_angles()
-                        # Ensure all angles are properly clamped for UI display
-                        for key, value in positions.items():
-                            positions[key] = max(-90.0, min(90.0, float(value)))
-                            last_known_positions[key] = positions[key]
-                    else:
-                        positions = last_known_positions
-                        
-                    # Send response with positions
-                    await websocket.send_text(json.dumps({
-                        'type': 'ack',
-                        'requestId': request_id,
-                        'status': 'success',
-                        'positions': positions
-                    }))
-                    
+                # Dispatch on message type
+                handler = MESSAGE_HANDLERS.get(msg.type)
+                if handler:
+                    await handler(websocket, msg)
                 else:
                     # Unknown message type
-                    logger.warning(f"Unknown WebSocket message type: {data.get('type')}")
-                    await websocket.send_text(json.dumps({
+                    logger.warning(f"Unknown WebSocket message type: {msg.type}")
+                    await websocket.send_text(encode_message({
                         'type': 'error',
                         'requestId': request_id,
-                        'message': f"Unknown message type: {data.get('type')}"
+                        'message': f"Unknown message type: {msg.type}"
                     }))
                     
-            except json.JSONDecodeError as e:
-                logger.error(f"Received invalid JSON: {message}")
+            except ValidationError as e:
+                logger.error(f"Received invalid message: {message}")
                 logger.error(traceback.format_exc())
+                invalid_json = any(error['type'] == 'json_invalid' for error in e.errors())
                 # Send error response
-                await websocket.send_text(json.dumps({
+                await websocket.send_text(encode_message({
                     'type': 'error',
-                    'message': 'Invalid JSON format'
+                    'message': 'Invalid JSON format' if invalid_json else str(e)
                 }))
                 
             except Exception as e:
                 logger.error(f"Error processing WebSocket message: {e}")
                 logger.error(traceback.format_exc())
                 
-                # Try sending error response with requestId if available
-                try:
-                    error_response = {
-                        'type': 'error',
-                        'message': str(e)
-                    }
-                    if request_id:
-                        error_response['requestId'] = request_id
-                    await websocket.send_text(json.dumps(error_response))
-                except:
-                    logger.error("Failed to send error response")
+                # Send error response with requestId if available
+                error_response = {
+                    'type': 'error',
+                    'message': str(e)
+                }
+                if request_id:
+                    error_response['requestId'] = request_id
+                await manager.send_personal_message(encode_message(error_response), websocket)
                     
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
@@ -662,7 +850,16 @@ def main():
     try:
         logger.info(f"Starting server on http://{args.host}:{args.port_number}")
         # Start the server with Uvicorn
-        uvicorn.run(app, host=args.host, port=args.port_number, log_level="info")
+        uvicorn.run(
+            app,
+            host=args.host,
+            port=args.port_number,
+            loop="uvloop",
+            http="httptools",
+            ws="websockets",
+            access_log=False,
+            log_level="debug" if args.debug else "warning"
+        )
     finally:
         # Clean up hardware resources when the app exits
         if servo_controller and servo_controller._is_connected:
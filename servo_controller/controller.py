@@ -1,14 +1,23 @@
 import time
 import numpy as np
 import scservo_sdk as scs
-import json
+import orjson
 import os
 import datetime
+import logging
+import struct
+
+from core.servos import set_low_latency
+
+logger = logging.getLogger(__name__)
 
 PROTOCOL_VERSION = 0
 BAUDRATE = 1_000_000
 TIMEOUT_MS = 1000
 NUM_RETRY = 10
+# Retry backoff doubles from RETRY_DELAY_MIN up to RETRY_DELAY_MAX seconds
+RETRY_DELAY_MIN = 0.001
+RETRY_DELAY_MAX = 0.02
 
 # Global configuration parameters
 P_COEFFICIENT = 8
@@ -30,6 +39,14 @@ SCS_CONTROL_TABLE = {
     "Acceleration": (41, 1),
 }
 
+# Little-endian packers and masks by register size in bytes
+_PACKERS = {
+    1: struct.Struct('<B').pack,
+    2: struct.Struct('<H').pack,
+    4: struct.Struct('<I').pack,
+}
+_MASKS = {size: (1 << (8 * size)) - 1 for size in _PACKERS}
+
 CENTER_POSITION = 2048
 MODEL_RESOLUTION = 4096
 
@@ -51,6 +68,10 @@ class ServoController:
         
         # Create a reverse mapping from ID to name for convenience
         self.id_to_name = {servo_id: name for name, servo_id in self.servos.items()}
+        # All servo ids and names in a fixed order; the ids double as the
+        # reader/writer key for whole-bus transactions
+        self._all_ids = tuple(self.id_to_name)
+        self._all_names = tuple(self.id_to_name.values())
         
         self._is_connected = False
         self._readers = {}
@@ -61,11 +82,11 @@ class ServoController:
         
         if os.path.exists(self.calibration_file):
             try:
-                with open(self.calibration_file, 'r') as f:
-                    self.calibration = json.load(f)
-                print(f"Loaded calibration from {self.calibration_file}")
+                with open(self.calibration_file, 'rb') as f:
+                    self.calibration = orjson.loads(f.read())
+                logger.info("Loaded calibration from %s", self.calibration_file)
             except Exception as e:
-                print(f"Error loading calibration: {e}")
+                logger.error("Error loading calibration: %s", e)
                 
         # Automatically connect and configure servos
         self.connect()
@@ -75,20 +96,20 @@ class ServoController:
         """Load configuration from config.json file."""
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                print(f"Loaded configuration from {self.config_file}")
+                with open(self.config_file, 'rb') as f:
+                    config = orjson.loads(f.read())
+                logger.info("Loaded configuration from %s", self.config_file)
                 return config
             else:
-                print(f"Config file not found: {self.config_file}")
+                logger.warning("Config file not found: %s", self.config_file)
                 return {}
         except Exception as e:
-            print(f"Error loading config: {e}")
+            logger.error("Error loading config: %s", e)
             return {}
 
     def connect(self):
         if self._is_connected:
-            print("Already connected, skipping connection")
+            logger.debug("Already connected, skipping connection")
             return
             
         self.port_handler = scs.PortHandler(self.port)
@@ -100,8 +121,10 @@ class ServoController:
             
             self.port_handler.setBaudRate(BAUDRATE)
             self.port_handler.setPacketTimeoutMillis(TIMEOUT_MS)
+            self._ser = self.port_handler.ser
+            set_low_latency(self._ser)
             self._is_connected = True
-            print(f"Connected on port={self.port}")
+            logger.info("Connected on port=%s", self.port)
         
         except Exception as e:
             if hasattr(self, 'port_handler') and self.port_handler:
@@ -121,7 +144,7 @@ class ServoController:
         self._readers = {}
         self._writers = {}
         self._is_connected = False
-        print("Disconnected")
+        logger.info("Disconnected")
 
     def calibrate(self):
         if not self._is_connected:
@@ -175,8 +198,8 @@ class ServoController:
         
         self.calibration["timestamp"] = datetime.datetime.now().isoformat()
         try:
-            with open(self.calibration_file, 'w') as f:
-                json.dump(self.calibration, f, indent=2)
+            with open(self.calibration_file, 'wb') as f:
+                f.write(orjson.dumps(self.calibration, option=orjson.OPT_INDENT_2))
             print(f"Saved calibration to {self.calibration_file}")
         except Exception as e:
             print(f"Error saving calibration: {e}")
@@ -186,18 +209,14 @@ class ServoController:
 
     def get_positions(self):
         """Get the current raw positions of all servos."""
-        servo_ids = list(self.id_to_name.keys())
-        positions = self._read("Present_Position", servo_ids)
-        return {name: int(pos) for servo_id, name, pos in 
-                zip(servo_ids, [self.id_to_name[id] for id in servo_ids], positions)}
+        positions = self._read("Present_Position", self._all_ids)
+        return dict(zip(self._all_names, positions.tolist()))
 
     def get_angles(self):
         """Get the current angles of all servos."""
-        servo_ids = list(self.id_to_name.keys())
-        positions = self._read("Present_Position", servo_ids)
-        return {name: self._position_to_angle(pos, servo_id) 
-                for servo_id, name, pos in 
-                zip(servo_ids, [self.id_to_name[id] for id in servo_ids], positions)}
+        positions = self._read("Present_Position", self._all_ids)
+        return {name: self._position_to_angle(pos, servo_id)
+                for servo_id, name, pos in zip(self._all_ids, self._all_names, positions.tolist())}
 
     def configure_servos(self):
         """Configure servo parameters using global configuration values."""
@@ -207,24 +226,24 @@ class ServoController:
         # Enable torque first to ensure servos are active
         self._write("Torque_Enable", 1)
         
-        servo_ids = list(self.id_to_name.keys())
-        for servo_id in servo_ids:
-            # Set to Position Control mode
-            self._write("Mode", 0, servo_id)
-            
-            # Set PID coefficients from global variables
-            self._write("P_Coefficient", P_COEFFICIENT, servo_id)
-            self._write("I_Coefficient", I_COEFFICIENT, servo_id)
-            self._write("D_Coefficient", D_COEFFICIENT, servo_id)
-            
-            # Disable the write lock to allow writing to EEPROM
-            self._write("Lock", 0, servo_id)
-            
-            # Set acceleration parameters from global variables
-            self._write("Maximum_Acceleration", MAX_ACCELERATION, servo_id)
-            self._write("Acceleration", ACCELERATION, servo_id)
+        # Each register is set on every servo with one sync write packet
+        # Set to Position Control mode
+        self._write("Mode", 0)
+        
+        # Set PID coefficients from global variables
+        self._write("P_Coefficient", P_COEFFICIENT)
+        self._write("I_Coefficient", I_COEFFICIENT)
+        self._write("D_Coefficient", D_COEFFICIENT)
+        
+        # Disable the write lock to allow writing to EEPROM
+        self._write("Lock", 0)
+        
+        # Set acceleration parameters from global variables
+        self._write("Maximum_Acceleration", MAX_ACCELERATION)
+        self._write("Acceleration", ACCELERATION)
             
-        print(f"Servos configured with P={P_COEFFICIENT}, I={I_COEFFICIENT}, D={D_COEFFICIENT}, Maximum Acceleration={MAX_ACCELERATION}, Acceleration={ACCELERATION}")
+        logger.info("Servos configured with P=%s, I=%s, D=%s, Maximum Acceleration=%s, Acceleration=%s",
+                    P_COEFFICIENT, I_COEFFICIENT, D_COEFFICIENT, MAX_ACCELERATION, ACCELERATION)
 
     def move(self, angles):
         """
@@ -252,7 +271,7 @@ class ServoController:
             
             # Log if angle is outside normal range
             if abs(angle) > 90:
-                print(f"Warning: {name} angle {angle}° is outside standard ±90° range")
+                logger.warning("%s angle %s° is outside standard ±90° range", name, angle)
         
         if positions:
             self._write("Goal_Position", positions, servo_ids)
@@ -306,7 +325,7 @@ class ServoController:
         
         # Ensure all calibration points are valid
         if zero_pos is None or pos_90_pos is None or neg_90_pos is None:
-            print(f"Warning: Incomplete calibration for servo {servo_id}, using default mapping")
+            logger.warning("Incomplete calibration for servo %s, using default mapping", servo_id)
             return int(CENTER_POSITION + (angle * MODEL_RESOLUTION / 360))
         
         # Simple linear interpolation between calibration points
@@ -352,7 +371,7 @@ class ServoController:
         
         # Ensure all calibration points are valid
         if zero_pos is None or pos_90_pos is None or neg_90_pos is None:
-            print(f"Warning: Incomplete calibration for servo {servo_id}, using default mapping")
+            logger.warning("Incomplete calibration for servo %s, using default mapping", servo_id)
             return (position - CENTER_POSITION) * 360 / MODEL_RESOLUTION
         
         # Handle position exactly at zero
@@ -363,7 +382,7 @@ class ServoController:
         if (position - zero_pos) * (pos_90_pos - zero_pos) > 0:
             # Check for division by zero
             if pos_90_pos == zero_pos:
-                print(f"Warning: pos_90_pos equals zero_pos for servo {servo_id}, cannot calculate angle")
+                logger.warning("pos_90_pos equals zero_pos for servo %s, cannot calculate angle", servo_id)
                 return 0.0
                 
             angle = 90.0 * (position - zero_pos) / (pos_90_pos - zero_pos)
@@ -374,7 +393,7 @@ class ServoController:
         else:
             # Check for division by zero
             if neg_90_pos == zero_pos:
-                print(f"Warning: neg_90_pos equals zero_pos for servo {servo_id}, cannot calculate angle")
+                logger.warning("neg_90_pos equals zero_pos for servo %s, cannot calculate angle", servo_id)
                 return 0.0
                 
             angle = -90.0 * (position - zero_pos) / (neg_90_pos - zero_pos)
@@ -386,12 +405,12 @@ class ServoController:
             self.connect()
 
         # If no servo IDs specified, use all servo IDs
-        servo_ids = servo_ids or list(self.id_to_name.keys())
+        servo_ids = servo_ids or self._all_ids
         if isinstance(servo_ids, int):
-            servo_ids = [servo_ids]
+            servo_ids = (servo_ids,)
 
         addr, size = SCS_CONTROL_TABLE[data_name]
-        group_key = f"{data_name}_{'_'.join(map(str, servo_ids))}"
+        group_key = (data_name, tuple(servo_ids))
         
         if group_key not in self._readers:
             reader = scs.GroupSyncRead(self.port_handler, self.packet_handler, addr, size)
@@ -400,9 +419,11 @@ class ServoController:
             self._readers[group_key] = reader
 
         reader = self._readers[group_key]
-        for _ in range(NUM_RETRY):
+        for attempt in range(NUM_RETRY):
             if reader.txRxPacket() == scs.COMM_SUCCESS:
                 break
+            self._recover()
+            self._backoff(attempt)
         else:
             raise RuntimeError("Communication error during read")
 
@@ -412,9 +433,9 @@ class ServoController:
         if not self._is_connected:
             self.connect()
 
-        servo_ids = servo_ids or list(self.id_to_name.keys())
+        servo_ids = servo_ids or self._all_ids
         if isinstance(servo_ids, int):
-            servo_ids = [servo_ids]
+            servo_ids = (servo_ids,)
 
         if values is None:
             values = [1] * len(servo_ids)
@@ -423,7 +444,7 @@ class ServoController:
             
         values = np.array(values, dtype=np.int32)
         addr, size = SCS_CONTROL_TABLE[data_name]
-        group_key = f"{data_name}_{'_'.join(map(str, servo_ids))}"
+        group_key = (data_name, tuple(servo_ids))
         
         if group_key not in self._writers:
             writer = scs.GroupSyncWrite(self.port_handler, self.packet_handler, addr, size)
@@ -435,49 +456,53 @@ class ServoController:
             for servo_id, val in zip(servo_ids, values):
                 writer.changeParam(servo_id, self._to_bytes(val, size))
 
-        for _ in range(NUM_RETRY):
+        for attempt in range(NUM_RETRY):
             if writer.txPacket() == scs.COMM_SUCCESS:
                 break
+            self._recover()
+            self._backoff(attempt)
         else:
             raise RuntimeError("Communication error during write")
 
+    def _recover(self):
+        """Drop stale bytes after a failed transaction so the retry starts clean."""
+        self._ser.reset_output_buffer()
+        self._ser.reset_input_buffer()
+
+    def _backoff(self, attempt):
+        """Wait before retry number attempt + 1; no wait after the last attempt."""
+        if attempt < NUM_RETRY - 1:
+            time.sleep(min(RETRY_DELAY_MAX, RETRY_DELAY_MIN * (1 << attempt)))
+
     def _to_bytes(self, value, size):
         """Convert an integer value to a list of bytes for the SCS protocol."""
-        if size == 1:
-            return [value & 0xFF]
-        elif size == 2:
-            return [value & 0xFF, (value >> 8) & 0xFF]
-        elif size == 4:
-            return [
-                value & 0xFF,
-                (value >> 8) & 0xFF,
-                (value >> 16) & 0xFF,
-                (value >> 24) & 0xFF,
-            ]
-        else:
+        packer = _PACKERS.get(size)
+        if packer is None:
             raise ValueError(f"Unsupported byte size: {size}")
+        return list(packer(int(value) & _MASKS[size]))
 
     def load_calibration(self):
         """Reload calibration data from file."""
         if os.path.exists(self.calibration_file):
             try:
-                with open(self.calibration_file, 'r') as f:
-                    self.calibration = json.load(f)
-                print(f"Reloaded calibration from {self.calibration_file}")
+                with open(self.calibration_file, 'rb') as f:
+                    self.calibration = orjson.loads(f.read())
+                logger.info("Reloaded calibration from %s", self.calibration_file)
                 
                 # Log calibration values for debugging
-                for servo_id, cal in self.calibration.items():
-                    if servo_id.isdigit():  # Only process servo entries, not metadata
-                        servo_name = self.id_to_name.get(int(servo_id), f"Unknown-{servo_id}")
-                        print(f"Servo {servo_name} (ID {servo_id}) calibration:")
-                        print(f"  Zero (0°): {cal.get('zero')}")
-                        print(f"  Max (+90°): {cal.get('max')}")
-                        print(f"  Min (-90°): {cal.get('min')}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    for servo_id, cal in self.calibration.items():
+                        if servo_id.isdigit():  # Only process servo entries, not metadata
+                            servo_name = self.id_to_name.get(int(servo_id), f"Unknown-{servo_id}")
+                            logger.debug("Servo %s (ID %s) calibration:", servo_name, servo_id)
+                            logger.debug("  Zero (0°): %s", cal.get('zero'))
+                            logger.debug("  Max (+90°): %s", cal.get('max'))
+                            logger.debug("  Min (-90°): %s", cal.get('min'))
                 
                 return True
             except Exception as e:
-                print(f"Error loading calibration: {e}")
+                logger.error("Error loading calibration: %s", e)
                 return False
         else:
-            print(f"Calibration file not found: {self.calibration_file}")
+            logger.warning("Calibration file not found: %s", self.calibration_file)
             return False 
\ No newline at end of file
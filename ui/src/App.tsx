@@ -22,11 +22,14 @@ const JOINT_TO_SERVO_ID: Record<string, number> = {
   "6-servo_6-grip": 6,
 };
 
+// Reverse mapping from servo IDs to URDF joint names, built once
+const SERVO_ID_TO_JOINT: Record<number, string> = Object.fromEntries(
+  Object.entries(JOINT_TO_SERVO_ID).map(([jointName, id]) => [id, jointName])
+);
+
 // Helper function to find a joint name by servo ID (for consistent lookup)
 const getJointNameById = (servoId: number): string | undefined => {
-  return Object.entries(JOINT_TO_SERVO_ID).find(
-    ([_, id]) => id === servoId
-  )?.[0];
+  return SERVO_ID_TO_JOINT[servoId];
 };
 
 function App() {
@@ -119,8 +122,7 @@ function App() {
             requestAnimationFrame(() => {
               try {
                 // Update each joint in the 3D model based on servo ID
-                const newAngles: Record<string, number> = { ...jointAngles };
-                let hasChanges = false;
+                const updates: Record<string, number> = {};
 
                 Object.entries(data.positions).forEach(
                   ([servoIdStr, degrees]) => {
@@ -137,24 +139,22 @@ function App() {
 
                       // Update the 3D model joint directly - high priority for responsiveness
                       robotRef.current.setJointValue(jointName, radians);
-
-                      // Only update React state if the change is significant
-                      // Use a smaller threshold for detecting changes (0.05 degrees vs 0.1)
-                      if (
-                        !newAngles[jointName] ||
-                        Math.abs(newAngles[jointName] - degreeValue) > 0.05
-                      ) {
-                        newAngles[jointName] = degreeValue;
-                        hasChanges = true;
-                      }
+                      updates[jointName] = degreeValue;
                     }
                   }
                 );
 
-                // Only update state if something changed - minimizes React re-renders
-                if (hasChanges) {
-                  setJointAngles(newAngles);
-                }
+                // Only update React state if a change is significant; returning
+                // the previous object skips the re-render entirely
+                // Use a smaller threshold for detecting changes (0.05 degrees vs 0.1)
+                setJointAngles((prevAngles) => {
+                  const hasChanges = Object.entries(updates).some(
+                    ([jointName, degreeValue]) =>
+                      !prevAngles[jointName] ||
+                      Math.abs(prevAngles[jointName] - degreeValue) > 0.05
+                  );
+                  return hasChanges ? { ...prevAngles, ...updates } : prevAngles;
+                });
               } finally {
                 updatingFromServer.current = false;
               }
@@ -184,7 +184,7 @@ function App() {
         socketCleanupRef.current = null;
       }
     };
-  }, [updateConnectionStatus, jointAngles]);
+  }, [updateConnectionStatus]);
 
   // Handle torque toggle
   const handleTorqueToggle = useCallback(async () => {
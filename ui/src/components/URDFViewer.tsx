@@ -23,6 +23,18 @@ interface URDFRobot extends THREE.Object3D {
   links: { [key: string]: URDFLink };
 }
 
+// Scratch vectors for the per-frame drag math, reused instead of allocating
+// new objects on every mouse move
+const _jointWorldPos = new THREE.Vector3();
+const _intersection = new THREE.Vector3();
+const _v1 = new THREE.Vector3();
+const _v2 = new THREE.Vector3();
+const _cross = new THREE.Vector3();
+const _closestPoint = new THREE.Vector3();
+const _movement = new THREE.Vector3();
+const _rayLine = new THREE.Line3();
+const _worldRotation = new THREE.Matrix4();
+
 // Simplified drag controls
 class URDFDragControls {
   raycaster: THREE.Raycaster;
@@ -38,6 +50,8 @@ class URDFDragControls {
   startIntersection: THREE.Vector3 | null = null;
   rotationAxis: THREE.Vector3 | null = null;
   lastValidAngle: number = 0;
+  // Hover targets, collected once instead of walking the robot every frame
+  meshes: THREE.Mesh[] = [];
 
   constructor(
     robotGroup: URDFRobot | null,
@@ -48,6 +62,17 @@ class URDFDragControls {
     this.onHover = () => {};
     this.onUnhover = () => {};
     this.dispatchEvent = dispatchEvent;
+    this.updateMeshes();
+  }
+
+  // Re-collect hover targets; call again once the robot's meshes have loaded
+  updateMeshes() {
+    this.meshes = [];
+    this.robot?.traverse((obj) => {
+      if (obj instanceof THREE.Mesh) {
+        this.meshes.push(obj);
+      }
+    });
   }
 
   moveRay(ray: THREE.Ray) {
@@ -57,26 +82,17 @@ class URDFDragControls {
     // Handle joint manipulation when grabbed
     if (this.grabbed && this.hovered) {
       this.manipulating = true;
-      const jointWorldPos = new THREE.Vector3();
-      this.hovered.getWorldPosition(jointWorldPos);
+      const jointWorldPos = this.hovered.getWorldPosition(_jointWorldPos);
 
       if (this.hovered.jointType !== "fixed") {
         // Initialize rotation axis
         if (!this.rotationAxis) {
-          if (this.hovered.axis) {
-            this.rotationAxis = this.hovered.axis.clone();
-            const worldMatrix = new THREE.Matrix4();
-            this.hovered.updateWorldMatrix(true, false);
-            worldMatrix.extractRotation(this.hovered.matrixWorld);
-            this.rotationAxis.applyMatrix4(worldMatrix);
-          } else {
-            this.rotationAxis = new THREE.Vector3(1, 0, 0);
-            const worldMatrix = new THREE.Matrix4();
-            this.hovered.updateWorldMatrix(true, false);
-            worldMatrix.extractRotation(this.hovered.matrixWorld);
-            this.rotationAxis.applyMatrix4(worldMatrix);
-          }
-          this.rotationAxis.normalize();
+          this.rotationAxis = this.hovered.axis
+            ? this.hovered.axis.clone()
+            : new THREE.Vector3(1, 0, 0);
+          this.hovered.updateWorldMatrix(true, false);
+          _worldRotation.extractRotation(this.hovered.matrixWorld);
+          this.rotationAxis.applyMatrix4(_worldRotation).normalize();
         }
 
         // Handle revolute or continuous joints
@@ -84,9 +100,8 @@ class URDFDragControls {
           this.hovered.jointType === "revolute" ||
           this.hovered.jointType === "continuous"
         ) {
-          const planeNormal = this.rotationAxis.clone();
-          const planePoint = jointWorldPos.clone();
-          const planeConstant = -planeNormal.dot(planePoint);
+          const planeNormal = this.rotationAxis;
+          const planeConstant = -planeNormal.dot(jointWorldPos);
           const rayOriginDotNormal = ray.origin.dot(planeNormal);
           const rayDirectionDotNormal = ray.direction.dot(planeNormal);
 
@@ -94,9 +109,7 @@ class URDFDragControls {
             const t =
               -(rayOriginDotNormal + planeConstant) / rayDirectionDotNormal;
             if (t > 0) {
-              const intersectionPoint = ray.origin
-                .clone()
-                .add(ray.direction.clone().multiplyScalar(t));
+              const intersectionPoint = ray.at(t, _intersection);
 
               if (!this.startIntersection) {
                 this.startIntersection = intersectionPoint.clone();
@@ -107,8 +120,8 @@ class URDFDragControls {
                 return;
               }
 
-              const v1 = this.startIntersection.clone().sub(jointWorldPos);
-              const v2 = intersectionPoint.clone().sub(jointWorldPos);
+              const v1 = _v1.subVectors(this.startIntersection, jointWorldPos);
+              const v2 = _v2.subVectors(intersectionPoint, jointWorldPos);
 
               v1.projectOnPlane(planeNormal).normalize();
               v2.projectOnPlane(planeNormal).normalize();
@@ -118,7 +131,7 @@ class URDFDragControls {
               }
 
               let angle = Math.acos(Math.min(1, Math.max(-1, v1.dot(v2))));
-              const cross = new THREE.Vector3().crossVectors(v1, v2);
+              const cross = _cross.crossVectors(v1, v2);
               if (cross.dot(planeNormal) < 0) {
                 angle = -angle;
               }
@@ -128,11 +141,7 @@ class URDFDragControls {
               // Apply joint limits
               if (this.hovered.jointType === "revolute" && this.hovered.limit) {
                 const { lower, upper } = this.hovered.limit;
-                if (newValue < lower) {
-                  newValue = lower;
-                } else if (newValue > upper) {
-                  newValue = upper;
-                }
+                newValue = THREE.MathUtils.clamp(newValue, lower, upper);
               }
 
               if (Math.abs(newValue - this.lastValidAngle) > 0.0001) {
@@ -145,12 +154,13 @@ class URDFDragControls {
         }
         // Handle prismatic joints
         else if (this.hovered.jointType === "prismatic") {
-          const closestPoint = new THREE.Vector3();
-          const line = new THREE.Line3(
-            ray.origin,
-            ray.origin.clone().add(ray.direction)
+          _rayLine.start.copy(ray.origin);
+          _rayLine.end.addVectors(ray.origin, ray.direction);
+          const closestPoint = _rayLine.closestPointToPoint(
+            jointWorldPos,
+            false,
+            _closestPoint
           );
-          line.closestPointToPoint(jointWorldPos, false, closestPoint);
 
           if (!this.startIntersection) {
             this.startIntersection = closestPoint.clone();
@@ -161,18 +171,17 @@ class URDFDragControls {
             return;
           }
 
-          const movement = closestPoint.clone().sub(this.startIntersection);
+          const movement = _movement.subVectors(
+            closestPoint,
+            this.startIntersection
+          );
           const distance = movement.dot(this.rotationAxis);
           const scale = 0.01;
           let newValue = this.startJointValue + distance * scale;
 
           if (this.hovered.limit) {
             const { lower, upper } = this.hovered.limit;
-            if (newValue < lower) {
-              newValue = lower;
-            } else if (newValue > upper) {
-              newValue = upper;
-            }
+            newValue = THREE.MathUtils.clamp(newValue, lower, upper);
           }
 
           if (Math.abs(newValue - this.lastValidAngle) > 0.0001) {
@@ -187,14 +196,7 @@ class URDFDragControls {
 
     // Check for hoverable joints when not manipulating
     if (!this.manipulating) {
-      const meshes: THREE.Mesh[] = [];
-      this.robot.traverse((obj) => {
-        if (obj instanceof THREE.Mesh) {
-          meshes.push(obj);
-        }
-      });
-
-      const intersects = this.raycaster.intersectObjects(meshes, false);
+      const intersects = this.raycaster.intersectObjects(this.meshes, false);
       let nearestJoint: URDFJoint | null = null;
 
       if (intersects.length > 0) {
@@ -268,6 +270,10 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
   const [error, setError] = useState<string | null>(null);
   const dragControlsRef = useRef<URDFDragControls | null>(null);
   const rayRef = useRef<THREE.Ray>(new THREE.Ray());
+  // Set when the mouse ray changes; the drag controls only raycast then
+  const rayDirtyRef = useRef<boolean>(false);
+  // Set whenever the scene needs drawing; the render loop skips clean frames
+  const needsRenderRef = useRef<boolean>(true);
   const hoverMaterialRef = useRef<THREE.MeshPhongMaterial | null>(null);
   const [webGLSupported, setWebGLSupported] = useState(true);
 
@@ -366,6 +372,8 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
       alpha: true,
       powerPreference: "high-performance",
     });
+    // Cap the drawing buffer at 2x; denser screens would multiply the pixels
+    // shaded and the shadow-pass fill rate for no visible gain
     renderer.setPixelRatio(Math.min(window.devicePixelRatio, 2));
     renderer.setSize(
       containerRef.current.clientWidth,
@@ -425,23 +433,68 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
     floor.receiveShadow = true;
     scene.add(floor);
 
+    // The grid, floor and lights never move, so compute their matrices once
+    // instead of recomposing them from position/rotation/scale every frame
+    [gridHelper, floor, ambientLight, directionalLight].forEach((obj) => {
+      obj.updateMatrix();
+      obj.matrixAutoUpdate = false;
+    });
+
     // Create hover material
     hoverMaterialRef.current = new THREE.MeshPhongMaterial({
       emissive: 0xffab40,
       emissiveIntensity: 0.25,
     });
 
-    // Animation loop
+    // Joint values as of the last check, to notice joints moved from outside
+    // the viewer (sliders and server position updates)
+    const lastJointValues: number[] = [];
+    const jointsChanged = () => {
+      const robot = robotRef.current;
+      if (!robot) return false;
+
+      let changed = false;
+      let i = 0;
+      for (const name in robot.joints) {
+        const jointValue = robot.joints[name].jointValue;
+        const value =
+          typeof jointValue === "number" ? jointValue : jointValue[0];
+        if (lastJointValues[i] !== value) {
+          lastJointValues[i] = value;
+          changed = true;
+        }
+        i++;
+      }
+      return changed;
+    };
+
+    // Animation loop. Frames are only drawn when something changed: camera
+    // movement (including damping), joint values, or a scene edit that set
+    // needsRenderRef. An idle view costs a few comparisons per frame.
     const animate = () => {
-      if (controlsRef.current) {
-        controlsRef.current.update();
+      if (controlsRef.current && controlsRef.current.update()) {
+        needsRenderRef.current = true;
       }
 
-      if (dragControlsRef.current && rayRef.current) {
+      // Moved joints shift the meshes under a still cursor, so the hover
+      // raycast has to rerun as if the ray itself had changed
+      if (jointsChanged()) {
+        needsRenderRef.current = true;
+        rayDirtyRef.current = true;
+      }
+
+      if (dragControlsRef.current && rayDirtyRef.current) {
+        rayDirtyRef.current = false;
         dragControlsRef.current.moveRay(rayRef.current);
       }
 
-      if (rendererRef.current && sceneRef.current && cameraRef.current) {
+      if (
+        needsRenderRef.current &&
+        rendererRef.current &&
+        sceneRef.current &&
+        cameraRef.current
+      ) {
+        needsRenderRef.current = false;
         rendererRef.current.render(sceneRef.current, cameraRef.current);
       }
 
@@ -449,15 +502,13 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
       frameIdRef.current = requestAnimationFrame(animate);
     };
 
-    // Set render priority to high
-    if (rendererRef.current) {
-      // Use higher precision rendering for smoother joint movements
-      rendererRef.current.setPixelRatio(window.devicePixelRatio);
-    }
-
     animate();
 
-    // Handle window resize
+    // Handle window resize. Both the ResizeObserver and the window listener
+    // fire for one resize, so the camera and drawing buffer are only rebuilt
+    // when the size actually changed
+    let lastWidth = 0;
+    let lastHeight = 0;
     const handleResize = () => {
       if (!containerRef.current || !cameraRef.current || !rendererRef.current)
         return;
@@ -466,10 +517,14 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
       const height = containerRef.current.clientHeight;
 
       if (width === 0 || height === 0) return;
+      if (width === lastWidth && height === lastHeight) return;
+      lastWidth = width;
+      lastHeight = height;
 
       cameraRef.current.aspect = width / height;
       cameraRef.current.updateProjectionMatrix();
       rendererRef.current.setSize(width, height);
+      needsRenderRef.current = true;
     };
 
     handleResize();
@@ -594,6 +649,18 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
 
     const manager = new THREE.LoadingManager();
 
+    // STL meshes finish loading after the robot itself is returned, so the
+    // drag controls' hover targets are refreshed once everything is in
+    manager.onLoad = () => {
+      dragControlsRef.current?.updateMeshes();
+      needsRenderRef.current = true;
+    };
+
+    // Draw each part as it arrives
+    manager.onProgress = () => {
+      needsRenderRef.current = true;
+    };
+
     manager.onError = (url) => {
       setError(`Failed to load ${url}`);
       setLoading(false);
@@ -602,6 +669,15 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
 
     const loader = new URDFLoader(manager);
 
+    // Every STL part uses the same look, so all meshes share one material
+    // instead of each creating its own; three.js can then draw the parts
+    // without switching material state between them
+    const meshMaterial = new THREE.MeshStandardMaterial({
+      color: 0x222222,
+      metalness: 0.9,
+      roughness: 0.2,
+    });
+
     // Setup mesh loading
     // @ts-expect-error: Incomplete typings
     loader.loadMeshCb = (
@@ -616,13 +692,7 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
         stlLoader.load(
           path,
           (geometry: THREE.BufferGeometry) => {
-            const material = new THREE.MeshStandardMaterial({
-              color: 0x222222,
-              metalness: 0.9,
-              roughness: 0.2,
-            });
-
-            const mesh = new THREE.Mesh(geometry, material);
+            const mesh = new THREE.Mesh(geometry, meshMaterial);
             mesh.castShadow = true;
             mesh.receiveShadow = true;
             done(mesh);
@@ -648,50 +718,13 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
         robotRef.current = result as unknown as URDFRobot;
         modelLoadedRef.current = true;
 
-        // Mark joints properly
+        // Mark joints and set up their axes and limits in a single pass
         robotRef.current.traverse((obj: THREE.Object3D) => {
           if (obj.userData && obj.userData.isURDFJoint) {
             (obj as any).isURDFJoint = true;
             (obj as any).jointType = obj.userData.jointType;
           }
-        });
-
-        // Set shadows
-        result.traverse((child: THREE.Object3D) => {
-          child.castShadow = true;
-          child.receiveShadow = true;
-        });
-
-        // Add to scene
-        sceneRef.current.add(result);
-
-        // Center the robot
-        const box = new THREE.Box3().setFromObject(result);
-        const center = box.getCenter(new THREE.Vector3());
-        result.position.x -= center.x;
-        result.position.z -= center.z;
-
-        // Position camera
-        if (cameraRef.current) {
-          const size = box.getSize(new THREE.Vector3());
-          const maxDim = Math.max(size.x, size.y, size.z);
-          const distance = maxDim * 2.5;
-
-          cameraRef.current.position.set(
-            distance,
-            distance * 0.8,
-            distance * 0.7
-          );
-          cameraRef.current.lookAt(new THREE.Vector3(0, size.y / 2, 0));
-
-          if (controlsRef.current) {
-            controlsRef.current.target.set(0, size.y / 2, 0);
-            controlsRef.current.update();
-          }
-        }
 
-        // Set up joint properties
-        result.traverse((obj: THREE.Object3D) => {
           if ((obj as any).isURDFJoint) {
             const joint = obj as URDFJoint;
 
@@ -722,50 +755,77 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
           }
         });
 
+        // Shadows are enabled per mesh in loadMeshCb; links and joints are
+        // plain groups that three.js never shadows
+
+        // Add to scene
+        sceneRef.current.add(result);
+        needsRenderRef.current = true;
+
+        // Center the robot
+        const box = new THREE.Box3().setFromObject(result);
+        const center = box.getCenter(new THREE.Vector3());
+        result.position.x -= center.x;
+        result.position.z -= center.z;
+
+        // Position camera
+        if (cameraRef.current) {
+          const size = box.getSize(new THREE.Vector3());
+          const maxDim = Math.max(size.x, size.y, size.z);
+          const distance = maxDim * 2.5;
+
+          cameraRef.current.position.set(
+            distance,
+            distance * 0.8,
+            distance * 0.7
+          );
+          cameraRef.current.lookAt(new THREE.Vector3(0, size.y / 2, 0));
+
+          if (controlsRef.current) {
+            controlsRef.current.target.set(0, size.y / 2, 0);
+            controlsRef.current.update();
+          }
+        }
+
         // Initialize drag controls
         const dragControls = new URDFDragControls(
           robotRef.current,
           dispatchCustomEvent
         );
 
-        // Set hover callbacks
-        dragControls.onHover = (joint) => {
-          dispatchCustomEvent("joint-mouseover", joint.name);
-
-          // Apply hover material
+        // Apply or restore the hover material on the meshes a joint moves,
+        // stopping at child joints
+        const setJointHovered = (joint: URDFJoint, hovered: boolean) => {
           const traverse = (c: THREE.Object3D) => {
             if (c !== joint && (c as any).isURDFJoint) {
               return;
             }
 
             if (c instanceof THREE.Mesh) {
-              (c as any).__originalMaterial = c.material;
-              c.material = hoverMaterialRef.current!;
+              if (hovered) {
+                (c as any).__originalMaterial = c.material;
+                c.material = hoverMaterialRef.current!;
+              } else if ((c as any).__originalMaterial) {
+                c.material = (c as any).__originalMaterial;
+              }
             }
 
             c.children.forEach(traverse);
           };
 
           traverse(joint);
+          needsRenderRef.current = true;
+        };
+
+        // Set hover callbacks
+        dragControls.onHover = (joint) => {
+          dispatchCustomEvent("joint-mouseover", joint.name);
+          setJointHovered(joint, true);
         };
 
         dragControls.onUnhover = (joint) => {
           dispatchCustomEvent("joint-mouseout", joint.name);
-
-          // Restore materials
-          const traverse = (c: THREE.Object3D) => {
-            if (c !== joint && (c as any).isURDFJoint) {
-              return;
-            }
-
-            if (c instanceof THREE.Mesh && (c as any).__originalMaterial) {
-              c.material = (c as any).__originalMaterial;
-            }
-
-            c.children.forEach(traverse);
-          };
-
-          traverse(joint);
+          setJointHovered(joint, false);
         };
 
         dragControlsRef.current = dragControls;
@@ -799,6 +859,7 @@ const URDFViewer = ({ onRobotLoaded }: URDFViewerProps) => {
 
       raycaster.setFromCamera(mouse, cameraRef.current);
       rayRef.current.copy(raycaster.ray);
+      rayDirtyRef.current = true;
     };
 
     const onMouseMove = (event: MouseEvent) => {
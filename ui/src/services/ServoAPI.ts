@@ -9,6 +9,9 @@ import { io, Socket } from "socket.io-client";
 const SOCKET_URL = `http://${window.location.hostname}:1212`;
 let socket: Socket | null = null;
 let eventListeners: Map<string, Set<(data: any) => void>> = new Map();
+// Servo ids for binary position frames, from the server's meta event
+let servoOrder: number[] = [];
+let positionScale = 100;
 
 export interface ServoPositions {
   [key: string]: number; // Index signature for dynamic access
@@ -36,6 +39,28 @@ export const initSocket = (): Socket => {
 
   // Set up event forwarding to registered listeners
   socket.onAny((eventName, data) => {
+    // Positions stream as binary sp_bin frames: one int16 little-endian value
+    // per servo in servoOrder, scaled by positionScale. A payload may hold
+    // several frames, oldest first; listeners get the newest as a regular
+    // servo_positions event
+    if (eventName === "meta") {
+      servoOrder = data.servo_ids;
+      positionScale = data.scale;
+    } else if (eventName === "sp_bin") {
+      const frameSize = servoOrder.length * 2;
+      if (frameSize === 0 || data.byteLength < frameSize) {
+        return;
+      }
+      const view = new DataView(data);
+      const offset = data.byteLength - frameSize;
+      const positions: ServoPositions = {};
+      servoOrder.forEach((servoId, i) => {
+        positions[servoId] = view.getInt16(offset + i * 2, true) / positionScale;
+      });
+      eventName = "servo_positions";
+      data = { positions };
+    }
+
     const listeners = eventListeners.get(eventName);
     if (listeners) {
       listeners.forEach((callback) => callback(data));